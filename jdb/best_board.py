@@ -0,0 +1,183 @@
+"""Searches the Boggle boards of the highest score.
+
+A search starts from a random board and changes one cell at a time: a change
+which raises the score is kept, a change which lowers it is kept with the
+probability exp(delta / temperature) of simulated annealing, undone
+otherwise. The temperature falls to 0 over the time budget, so the search
+ends as a hill climbing. A board is re-scored with Grid.set_cell(), from the
+words lost and gained by the change, instead of being solved again.
+
+The restarts run in parallel in a pool of processes, and the best board is
+printed as JSON with the throughput, in boards scored per second:
+$ python3 best_board.py --seconds 60 --restarts 8 --workers 4
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from collections import Counter
+
+import boggle
+
+# The points of a word, by number of letters: 8 letters and more score 11.
+SCORES = {3: 1, 4: 1, 5: 2, 6: 3, 7: 5}
+
+
+def word_score(word):
+  """Returns the points of a word, 0 under 3 letters."""
+  if len(word) >= 8:
+    return 11
+  return SCORES.get(len(word), 0)
+
+
+def score(words):
+  return sum(map(word_score, words))
+
+
+def letter_weights(words):
+  """Returns the letters of the words, and their frequencies."""
+  counts = Counter(letter for word in words for letter in word)
+  return list(counts), list(counts.values())
+
+
+def anneal(lexicon, letters, weights, size=4, seconds=10, temperature=2.0,
+           seed=0):
+  """Returns the best (score, rows) found in 'seconds' from a random board,
+  and the number of boards scored."""
+  rng, deadline = random.Random(seed), time.perf_counter() + seconds
+  rows = [''.join(rng.choices(letters, weights, k=size)) for _ in range(size)]
+  grid = boggle.Grid(*rows, lexicon=lexicon)
+  current = score(grid.solve())
+  best, scored = (current, list(grid.grid)), 1
+
+  while True:
+    left = deadline - time.perf_counter()
+    if left <= 0:
+      return best, scored
+    position = rng.randrange(size), rng.randrange(size)
+    old, new = grid[position], rng.choices(letters, weights)[0]
+    if new == old:
+      continue
+    lost, gained = grid.set_cell(position, new)
+    scored += 1
+    delta = score(gained) - score(lost)
+    heat = temperature * left / seconds
+    if delta >= 0 or heat and rng.random() < math.exp(delta / heat):
+      current += delta
+      if current > best[0]:
+        best = current, list(grid.grid)
+    else:
+      grid.set_cell(position, old)
+
+
+# The lexicon and the letters of the processes of a search() pool.
+_worker_state = None
+
+
+def _init_worker(lexicon, letters, weights):
+  global _worker_state
+  _worker_state = lexicon, letters, weights
+
+
+def _restart(task):
+  seed, size, seconds, temperature = task
+  return anneal(*_worker_state, size=size, seconds=seconds,
+                temperature=temperature, seed=seed)
+
+
+def search(lexicon, words, restarts=4, workers=None, size=4, seconds=10,
+           temperature=2.0):
+  """Runs 'restarts' annealings of 'seconds' each, in a pool of 'workers'
+  processes, and returns a report of the best board as a dict."""
+  letters, weights = letter_weights(words)
+  tasks = [(seed, size, seconds, temperature) for seed in range(restarts)]
+  start = time.perf_counter()
+  with multiprocessing.Pool(workers, _init_worker,
+                            (lexicon, letters, weights)) as pool:
+    results = pool.map(_restart, tasks, chunksize=1)
+  elapsed = time.perf_counter() - start
+
+  (best_score, rows), _ = max(results)
+  scored = sum(count for _, count in results)
+  return {
+      'score': best_score,
+      'board': rows,
+      'words': sorted(boggle.Grid(*rows, lexicon=lexicon).words()),
+      'restart_scores': sorted(result_score for (result_score, _), _
+                               in results),
+      'boards_scored': scored,
+      'seconds': elapsed,
+      'boards_per_second': scored / elapsed,
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--dictionary', default=boggle.DICTIONARY)
+  parser.add_argument('--size', type=int, default=4)
+  parser.add_argument('--seconds', type=float, default=10,
+                      help='time budget of each restart')
+  parser.add_argument('--restarts', type=int, default=4)
+  parser.add_argument('--workers', type=int,
+                      help='processes of the pool, one per CPU by default')
+  parser.add_argument('--temperature', type=float, default=2.0,
+                      help='initial temperature, 0 for a hill climbing')
+  args = parser.parse_args(argv)
+
+  words = list(boggle.dictionary_words(args.dictionary))
+  lexicon = boggle.Trie()
+  for word in words:
+    lexicon.add(word)
+  report = search(lexicon, words, args.restarts, args.workers, args.size,
+                  args.seconds, args.temperature)
+  json.dump(report, sys.stdout, indent=2)
+  print()
+
+
+# To run all the tests:
+# $ python3 -m unittest best_board
+
+import unittest
+
+
+class BestBoardTest(unittest.TestCase):
+
+  WORDS = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat', 'rca',
+           'tad', 'tar', 'cart', 'carts', 'darts', 'tracts', 'attract']
+
+  def lexicon(self):
+    lexicon = boggle.Trie()
+    for word in self.WORDS:
+      lexicon.add(word)
+    return lexicon
+
+  def test_score(self):
+    self.assertEqual([word_score(w) for w in
+                      ['ad', 'act', 'cart', 'carts', 'tracts', 'attract',
+                       'attracts', 'abstractions']],
+                     [0, 1, 1, 2, 3, 5, 11, 11])
+    self.assertEqual(score(['act', 'carts', 'ad']), 3)
+
+  def test_anneal(self):
+    lexicon = self.lexicon()
+    letters, weights = letter_weights(self.WORDS)
+    (best, rows), scored = anneal(lexicon, letters, weights, size=3,
+                                  seconds=0.3, seed=1)
+    self.assertGreater(scored, 10)
+    self.assertEqual(best, score(boggle.Grid(*rows, lexicon=lexicon).words()))
+    self.assertGreater(best, 0)
+
+  def test_search(self):
+    report = search(self.lexicon(), self.WORDS, restarts=2, workers=2,
+                    size=3, seconds=0.2)
+    self.assertEqual(report['score'], max(report['restart_scores']))
+    self.assertEqual(report['score'], score(report['words']))
+    self.assertGreater(report['boards_per_second'], 0)
+
+
+if __name__ == '__main__':
+  main()
@@ -14,43 +14,290 @@ The lexicon is a class with these two methods:
 """
 
 
-from collections import OrderedDict
-from itertools import product
+import multiprocessing
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait)
+from functools import lru_cache
+from itertools import islice, product
+
+
+@lru_cache(maxsize=None)
+def adjacency(rows, cols, connectivity=8):
+  """Returns the neighbors of the cells of a rows x cols grid, the cell (x, y)
+  being number x + y * cols, as 2 flat tuples: the neighbors of the cell i are
+  neighbors[offsets[i]:offsets[i + 1]].
+
+  With a connectivity of 4, the diagonal cells are not neighbors. The tables
+  are computed once per shape, and shared by all the grids of this shape:
+  they are immutable, and their slices reuse the int objects."""
+  if connectivity not in (4, 8):
+    raise ValueError('The connectivity is 4 or 8, not %r' % connectivity)
+  offsets, neighbors = [0], []
+  for y, x in product(range(rows), range(cols)):
+    for dx, dy in product([-1, 0, 1], [-1, 0, 1]):
+      xn, yn = x + dx, y + dy
+      if ((dx or dy) and (connectivity == 8 or not (dx and dy)) and
+          0 <= xn < cols and 0 <= yn < rows):
+        neighbors.append(xn + yn * cols)
+    offsets.append(len(neighbors))
+  return tuple(offsets), tuple(neighbors)
+
 
 class Grid:
 
-  def __init__(self, *grid, lexicon=None):
+  def __init__(self, *grid, lexicon=None, connectivity=8):
     self.grid, self.lexicon = grid, lexicon if lexicon else load_lexicon()
     self.x_max, self.y_max = len(grid[0]), len(grid)
+    self.offsets, self.adjacent = adjacency(
+        self.y_max, self.x_max, connectivity)
+    # The paths indexed by solve(), by word, lexicon cursor, ending cell and
+    # crossed cell: None until the first solve().
+    self.index = self.cursors = self.ending = self.through = None
+    # A lexicon with an alphabet, like lexicon.CodedTrie, steps its cursors
+    # with the codes of the letters: the grid is encoded once, here.
+    alphabet = getattr(self.lexicon, 'alphabet', None)
+    self.symbols = tuple(map(alphabet.encode, grid)) if alphabet else grid
+    # the letters and the symbols of the cells, numbered like in adjacency().
+    self.cell_letters = [letter for row in grid for letter in row]
+    self.cell_symbols = [symbol for row in self.symbols for symbol in row]
+    # The frames of the 'stack' traversal, see _stack_cells().
+    self._frames = None
 
   def __getitem__(self, position):
     """Returns the letter found at 'position'."""
     return self.grid[position[1]][position[0]]
 
-  def words(self):
-    """Returns words found on the grid."""
-    words = set()
-    for slot in product(range(self.x_max), range(self.y_max)):
-      self._check_prefixes(slot, words)
+  def words(self, traversal='bitmask', workers=None, max_length=None):
+    """Returns words found on the grid.
+
+    The 'bitmask' traversal numbers the cells and keeps the visited ones in
+    the bits of an int, the 'paths' traversal keeps the path of positions in
+    an OrderedDict, the 'stack' traversal keeps the path in preallocated
+    arrays, without any recursion: it is meant for the large grids, and only
+    it can stop the words at 'max_length' letters. All find the same words.
+
+    With 'workers', the paths of each starting cell are searched by a pool of
+    as many processes. The grid and its lexicon are sent once to each worker:
+    a lexicon.SharedLexicon is only sent as the name of its block, and the
+    workers all read the same pages."""
+    if traversal not in ('bitmask', 'paths', 'stack'):
+      raise ValueError('Unknown traversal: %r' % traversal)
+    if max_length is not None and traversal != 'stack':
+      raise ValueError('max_length needs the stack traversal')
+    if workers:
+      tasks = [(cell, traversal, max_length) for cell in self._busiest_first()]
+      with multiprocessing.Pool(workers, _init_worker, (self,)) as pool:
+        words = set().union(*pool.imap_unordered(_cell_words, tasks))
+    else:
+      words = set()
+      for cell in range(self.x_max * self.y_max):
+        self._start_from(cell, traversal, words, max_length)
     # the returned words are reverse-sorted by word length.
     return sorted(words, key=len, reverse=True)
 
+  def _start_from(self, cell, traversal, words, max_length=None):
+    """Adds the words of the paths starting from the cell number 'cell'."""
+    if traversal == 'bitmask':
+      self._visit_cells(cell, words)
+    elif traversal == 'stack':
+      self._stack_cells(cell, words, max_length)
+    else:
+      self._check_prefixes((cell % self.x_max, cell // self.x_max), words)
+    return words
+
+  def _busiest_first(self):
+    """Returns the cells, the most expensive to search first.
+
+    A cell with more neighbors, and closer to the center, starts many more
+    paths than a corner: the workers take the cells one at a time, and the
+    cheap ones are left to fill the gaps at the end."""
+    center_x, center_y = (self.x_max - 1) / 2, (self.y_max - 1) / 2
+    def cost(cell):
+      x, y = cell % self.x_max, cell // self.x_max
+      return (self.offsets[cell] - self.offsets[cell + 1],
+              abs(x - center_x) + abs(y - center_y))
+    return sorted(range(self.x_max * self.y_max), key=cost)
+
+  def _visit_cells(self, start, words):
+    """Adds the words of the paths starting from the cell number 'start'.
+
+    The cells visited by the path are the bits set in 'visited': checking
+    and marking a cell are integer operations, nothing is allocated but the
+    cursors and the prefixes. The cells are numbered like in adjacency()."""
+    offsets, adjacent = self.offsets, self.adjacent
+    letters, symbols = self.cell_letters, self.cell_symbols
+
+    def visit(cell, cursor, visited, prefix):
+      for neighbor in adjacent[offsets[cell]:offsets[cell + 1]]:
+        if not visited >> neighbor & 1:
+          child = cursor.step(symbols[neighbor])
+          if child.alive:
+            word = prefix + letters[neighbor]
+            if child.is_word:
+              words.add(word)
+            visit(neighbor, child, visited | 1 << neighbor, word)
+
+    cursor = self.lexicon.root_cursor().step(symbols[start])
+    if cursor.alive:
+      if cursor.is_word:
+        words.add(letters[start])
+      visit(start, cursor, 1 << start, letters[start])
+
+  def _stack_cells(self, start, words, max_length=None):
+    """Adds the words of at most 'max_length' letters of the paths starting
+    from the cell number 'start'.
+
+    The path is a stack of frames, in arrays allocated once per grid: the
+    frame d holds the cell number d of the path, the lexicon cursor after its
+    letter, and the index in self.adjacent of the next neighbor to try. The
+    visited cells are flags in a bytearray: a step costs the same on any size
+    of grid, and the depth is only bounded by the memory."""
+    offsets, adjacent = self.offsets, self.adjacent
+    letters, symbols = self.cell_letters, self.cell_symbols
+    size = len(letters) if max_length is None else min(max_length, len(letters))
+    if self._frames is None or len(self._frames[0]) < size:
+      self._frames = ([0] * size, [None] * size, [0] * size, [''] * size,
+                      bytearray(len(letters)))
+    cells, cursors, next_neighbors, path, visited = self._frames
+
+    cursor = self.lexicon.root_cursor().step(symbols[start])
+    if not cursor.alive or not size:
+      return
+    if cursor.is_word:
+      words.add(letters[start])
+    cells[0], cursors[0], path[0] = start, cursor, letters[start]
+    next_neighbors[0], visited[start], depth = offsets[start], 1, 0
+    while depth >= 0:
+      cell, i = cells[depth], next_neighbors[depth]
+      if i == offsets[cell + 1] or depth + 1 == size:
+        visited[cell] = 0
+        depth -= 1
+        continue
+      next_neighbors[depth] = i + 1
+      neighbor = adjacent[i]
+      if visited[neighbor]:
+        continue
+      child = cursors[depth].step(symbols[neighbor])
+      if not child.alive:
+        continue
+      depth += 1
+      cells[depth], cursors[depth] = neighbor, child
+      next_neighbors[depth], path[depth] = offsets[neighbor], letters[neighbor]
+      visited[neighbor] = 1
+      if child.is_word:
+        words.add(''.join(path[:depth + 1]))
+
+  def solve(self):
+    """Returns the words of the grid, like words(), and indexes the paths
+    of the search, for set_cell().
+
+    Each path spelling a prefix is kept with its lexicon cursor, and by the
+    cells it goes through and ends at; the paths spelling a word are also
+    kept by word, in self.index."""
+    cells = range(len(self.cell_letters))
+    self.index, self.cursors = {}, {}
+    self.ending = [set() for _ in cells]
+    self.through = [set() for _ in cells]
+    root = self.lexicon.root_cursor()
+    for cell in cells:
+      self._extend((), root, cell)
+    return sorted(self.index, key=len, reverse=True)
+
+  def set_cell(self, position, letter):
+    """Changes the letter at 'position', and updates the index of solve().
+
+    Only the paths through the cell are searched again: the paths which go
+    through it are dropped, and the paths of prefixes ending next to it are
+    extended again from it. Returns the words lost and the words gained, so
+    that a score can be updated without solving the grid again."""
+    if len(letter) != 1:
+      raise ValueError('A cell holds one letter, not %r' % (letter,))
+    if self.index is None:
+      self.solve()
+    x, y = position
+    cell = x + y * self.x_max
+    lost = set()
+    for path in self.through[cell]:
+      cursor = self.cursors.pop(path)
+      self.ending[path[-1]].discard(path)
+      for other in path:
+        if other != cell:
+          self.through[other].discard(path)
+      if cursor.is_word:
+        word = self._spell(path)
+        self.index[word].discard(path)
+        if not self.index[word]:
+          del self.index[word]
+          lost.add(word)
+    self.through[cell] = set()
+
+    row = self.grid[y][:x] + letter + self.grid[y][x + 1:]
+    self.grid = self.grid[:y] + (row,) + self.grid[y + 1:]
+    alphabet = getattr(self.lexicon, 'alphabet', None)
+    if alphabet:
+      symbols = alphabet.encode(row)
+      self.symbols = self.symbols[:y] + (symbols,) + self.symbols[y + 1:]
+    else:
+      self.symbols = self.grid
+    self.cell_letters[cell] = letter
+    self.cell_symbols[cell] = self.symbols[y][x]
+
+    words = set(self.index)
+    self._extend((), self.lexicon.root_cursor(), cell)
+    for neighbor in self.adjacent[self.offsets[cell]:self.offsets[cell + 1]]:
+      for path in list(self.ending[neighbor]):
+        if cell not in path:
+          self._extend(path, self.cursors[path], cell)
+    gained = set(self.index) - words
+    return lost - gained, gained - lost
+
+  def _spell(self, path):
+    return ''.join(self.cell_letters[cell] for cell in path)
+
+  def _extend(self, path, cursor, cell):
+    """Indexes 'path' extended with the cell number 'cell', if it spells a
+    prefix, then its own extensions; 'cursor' is the cursor of 'path'."""
+    cursor = cursor.step(self.cell_symbols[cell])
+    if not cursor.alive:
+      return
+    path += (cell,)
+    self.cursors[path] = cursor
+    self.ending[cell].add(path)
+    for other in path:
+      self.through[other].add(path)
+    if cursor.is_word:
+      self.index.setdefault(self._spell(path), set()).add(path)
+    for neighbor in self.adjacent[self.offsets[cell]:self.offsets[cell + 1]]:
+      if neighbor not in path:
+        self._extend(path, cursor, neighbor)
+
   def _check_prefixes(self, slot, words):
     traversal = self._traverse(slot)
     backtrack_request = None
+    # cursors[i] is the lexicon cursor after the i first letters of the path:
+    # each new slot costs one step() from its parent's cursor.
+    cursors, letters = [self.lexicon.root_cursor()], []
     while True:
       try:
         path = traversal.send(backtrack_request)
       except StopIteration:
         return words
 
-      prefix = ''.join(self[s] for s in path)
-      if not self.lexicon.is_prefix(prefix):
+      depth = len(path)
+      del cursors[depth:], letters[depth - 1:]
+      x, y = next(reversed(path))
+      letter = self.grid[y][x]
+      cursor = cursors[-1].step(self.symbols[y][x])
+      if not cursor.alive:
         backtrack_request = True
       else:
         backtrack_request = False
-        if self.lexicon.is_word(prefix):
-          words.add(prefix)
+        cursors.append(cursor)
+        letters.append(letter)
+        if cursor.is_word:
+          words.add(''.join(letters))
 
 
   def _traverse(self, slot, path=None):
@@ -69,44 +316,255 @@ class Grid:
 
   def _children(self, visited, x, y):
     """Generate the unvisited neighbors of 'position'."""
-    for dx, dy in product([-1, 0, 1], [-1, 0, 1]):
-        xn, yn = x + dx, y + dy
-        if (0 <= xn < self.x_max and 0 <= yn < self.y_max and
-            (xn, yn) not in visited):
-          yield xn, yn
-
-
-def load_lexicon():
-  trie = Trie()
-  # On linux, install the file below with:
-  # $ sudo apt-get install wamerican
-  with open('/usr/share/dict/american-english') as f:
-    for word in [w.strip().lower() for w in f
-                 if not w.strip().endswith("'s") and len(w.strip())>1]:
-      trie.add(word)
+    cell = x + y * self.x_max
+    for neighbor in self.adjacent[self.offsets[cell]:self.offsets[cell + 1]]:
+      position = neighbor % self.x_max, neighbor // self.x_max
+      if position not in visited:
+        yield position
+
+
+# The grid searched by the processes of a Grid.words() pool.
+_worker_grid = None
+
+
+def _init_worker(grid):
+  global _worker_grid
+  _worker_grid = grid
+
+
+def _cell_words(task):
+  """Returns the words of the paths starting from a cell of _worker_grid."""
+  cell, traversal, max_length = task
+  return _worker_grid._start_from(cell, traversal, set(), max_length)
+
+
+# The lexicon of the processes of a solve_many() pool, and their stack frames
+# by board shape.
+_worker_lexicon, _worker_frames = None, {}
+
+
+def _init_solver(lexicon):
+  global _worker_lexicon
+  _worker_lexicon = lexicon
+
+
+def _solve_board(board_id, rows, traversal):
+  return board_id, _solve(rows, _worker_lexicon, traversal, _worker_frames)
+
+
+def _solve(rows, lexicon, traversal, frames):
+  """Returns the words of a board, solved with the stack frames left by the
+  previous board of its shape in 'frames', a dict updated in place."""
+  grid = Grid(*rows, lexicon=lexicon)
+  shape = grid.y_max, grid.x_max
+  grid._frames = frames.get(shape)
+  words = grid.words(traversal)
+  if grid._frames is not None:
+    frames[shape] = grid._frames
+  return words
+
+
+def solve_many(boards, lexicon=None, workers=None, max_in_flight=None,
+               traversal='bitmask'):
+  """Yields (board_id, words) for each of the boards, once it is solved.
+
+  'boards' is an iterable of boards, each a sequence of rows, or a dict of
+  board_id to board: the board_id of a board from an iterable is its
+  position. The lexicon is loaded once for all the boards, and the boards of
+  a same shape share their adjacency tables and, in each process, the stack
+  frames of the 'stack' traversal.
+
+  With 'workers', the boards are solved by a pool of processes, and yielded
+  as they finish. At most 'max_in_flight' boards, 2 per worker by default,
+  are solved or waiting in the pool: the next boards are only read from
+  'boards' as the results are consumed, so a stream of boards of any length
+  is solved in flat memory."""
+  lexicon = lexicon if lexicon else load_lexicon()
+  tasks = boards.items() if hasattr(boards, 'items') else enumerate(boards)
+  if not workers:
+    frames = {}
+    for board_id, rows in tasks:
+      yield board_id, _solve(rows, lexicon, traversal, frames)
+    return
+
+  max_in_flight = max_in_flight or 2 * workers
+  pending = set()
+  with ProcessPoolExecutor(workers, initializer=_init_solver,
+                           initargs=(lexicon,)) as executor:
+    try:
+      for board_id, rows in tasks:
+        if len(pending) >= max_in_flight:
+          done, pending = wait(pending, return_when=FIRST_COMPLETED)
+          for future in done:
+            yield future.result()
+        pending.add(executor.submit(_solve_board, board_id, rows, traversal))
+      for future in as_completed(pending):
+        yield future.result()
+    finally:
+      # the caller stopped early: the boards not started yet are dropped.
+      for future in pending:
+        future.cancel()
+
+
+class BoardPruner:
+  """Builds, for a board, the sub-lexicon of the words which may be on it.
+
+  A word can only be on a board if the board has all its letters, as many
+  times as the word does, and if each pair of consecutive letters of the word
+  is found on two adjacent cells. The letters and the pairs of each word are
+  numbered once, as the bits of 2 ints: a check is one integer operation.
+
+  The words are grouped by the bitmask of their letters. On a board with few
+  distinct letters, the groups are looked up for each subset of these
+  letters, otherwise each group is checked: only the words of the groups
+  left are checked one by one.
+
+  The pre-pass only pays when it leaves few words: on a large board, which
+  has nearly all the letters and pairs, lexicon() returns the full lexicon
+  once more than 'max_share' of the words may be on the board.
+
+    >>> pruner = BoardPruner(dictionary_words())
+    >>> Grid(*rows, lexicon=pruner.lexicon(*rows)).words()
+  """
+
+  def __init__(self, words, lexicon_class=None, lexicon=None, max_share=0.05):
+    self.lexicon_class = lexicon_class or Trie
+    # the lexicon of all the words, built on the first board which needs it.
+    self.full_lexicon, self.max_share = lexicon, max_share
+    self.bits, self.pair_bits, self.groups = {}, {}, {}
+    self.size = 0
+    for word in words:
+      self.size += 1
+      mask = pairs = 0
+      for letter in word:
+        mask |= 1 << self.bits.setdefault(letter, len(self.bits))
+      for i in range(len(word) - 1):
+        pair = word[i:i + 2]
+        pairs |= 1 << self.pair_bits.setdefault(pair, len(self.pair_bits))
+      # the letters found more than once, with their count.
+      repeats = tuple((letter, count) for letter, count in
+                      Counter(word).items() if count > 1)
+      self.groups.setdefault(mask, []).append((word, pairs, repeats))
+
+  def words(self, *grid, connectivity=8):
+    """Yields the words which pass the checks on the board 'grid'."""
+    letters = [letter for row in grid for letter in row]
+    counts = Counter(letters)
+    board_mask = sum(1 << self.bits[letter]
+                     for letter in counts if letter in self.bits)
+    offsets, adjacent = adjacency(len(grid), len(grid[0]), connectivity)
+    board_pairs = {letters[cell] + letters[neighbor]
+                   for cell in range(len(letters))
+                   for neighbor in adjacent[offsets[cell]:offsets[cell + 1]]}
+    missing_pairs = ~sum(1 << self.pair_bits[pair]
+                         for pair in board_pairs if pair in self.pair_bits)
+
+    if 1 << bin(board_mask).count('1') < len(self.groups):
+      # the subsets of the letters of the board are fewer than the groups.
+      masks, subset = [], board_mask
+      while subset:
+        masks.append(subset)
+        subset = (subset - 1) & board_mask
+      groups = [self.groups[mask] for mask in masks if mask in self.groups]
+    else:
+      groups = [group for mask, group in self.groups.items()
+                if not mask & ~board_mask]
+    for group in groups:
+      for word, pairs, repeats in group:
+        if not pairs & missing_pairs and all(
+            counts[letter] >= count for letter, count in repeats):
+          yield word
+
+  def lexicon(self, *grid, connectivity=8):
+    """Returns a lexicon_class() of the words which may be on the board, or
+    the full lexicon if they are more than 'max_share' of the words."""
+    most = self.max_share * self.size
+    words = list(islice(self.words(*grid, connectivity=connectivity),
+                        int(most) + 1))
+    if len(words) > most:
+      return self._full()
+    lexicon = self.lexicon_class()
+    for word in words:
+      lexicon.add(word)
+    return lexicon
+
+  def _full(self):
+    if self.full_lexicon is None:
+      self.full_lexicon = self.lexicon_class()
+      for group in self.groups.values():
+        for word, _, _ in group:
+          self.full_lexicon.add(word)
+    return self.full_lexicon
+
+
+# On linux, install the file below with:
+# $ sudo apt-get install wamerican
+DICTIONARY = '/usr/share/dict/american-english'
+
+
+def dictionary_words(path=DICTIONARY):
+  """Yields the lowercase words of the dictionary, without the possessives."""
+  with open(path) as f:
+    for w in f:
+      w = w.strip()
+      if not w.endswith("'s") and len(w) > 1:
+        yield w.lower()
+
+
+def load_lexicon(lexicon_class=None, path=DICTIONARY, snapshot=None):
+  """Returns a lexicon of the dictionary words, a Trie by default.
+
+  Any class with an add() method, like lexicon.ArrayTrie, can be used.
+
+  With a 'snapshot' path, the lexicon is a lexicon.MappedLexicon of this file,
+  which is built from the dictionary first if it does not exist. Next calls,
+  from any process, skip reading the dictionary and building the trie."""
+  if snapshot:
+    from lexicon import ArrayTrie, MappedLexicon
+    if not os.path.exists(snapshot):
+      load_lexicon(ArrayTrie, path).save(snapshot)
+    return MappedLexicon(snapshot)
+
+  trie = (lexicon_class or Trie)()
+  for word in dictionary_words(path):
+    trie.add(word)
   return trie
 
 
 class Trie:
 
+  # The root counts the words removed since the last compact(): dicts never
+  # shrink, so a trie under churn is rebuilt every compact_every removals.
+  removed, compact_every = 0, 10000
+
   def __init__(self):
     self.children = {}
     self.full_word = False
+    self.count = 0  # the number of words in the subtree.
 
   def add(self, letters):
-    first, *rest = letters
-    if first not in self.children:
-      self.children[first] = Trie()
-    if rest:
-      self.children[first].add(rest)
-    else:
-      self.children[first].full_word = True
+    """Adds a word, returns False if it was already in the trie."""
+    path = [self]
+    for letter in letters:
+      node = path[-1].children.get(letter)
+      if node is None:
+        node = path[-1].children[letter] = Trie()
+      path.append(node)
+    if len(path) == 1 or path[-1].full_word:
+      return False
+    path[-1].full_word = True
+    for node in path:
+      node.count += 1
+    return True
 
   def __getitem__(self, letters):
-    first, *rest = letters
-    if first not in self.children:
-      return False
-    return self.children[first][rest] if rest else self.children[first]
+    """Returns the node reached by 'letters', False if not found."""
+    node = self
+    for letter in letters:
+      node = node.children.get(letter)
+      if node is None:
+        return False
+    return node
 
   def is_word(self, letters):
     trie = self[letters]
@@ -115,8 +573,170 @@ class Trie:
   def is_prefix(self, letters):
     return bool(self[letters])
 
+  def root_cursor(self):
+    return TrieCursor(self)
+
+  def remove(self, letters):
+    """Removes a word, and the nodes left without any word below them.
+
+    Returns False if the word was not in the trie."""
+    path = [self]
+    for letter in letters:
+      node = path[-1].children.get(letter)
+      if node is None:
+        return False
+      path.append(node)
+    if not path[-1].full_word:
+      return False
+
+    path[-1].full_word = False
+    for node in path:
+      node.count -= 1
+    for depth in range(len(letters), 0, -1):
+      if path[depth].full_word or path[depth].children:
+        break
+      del path[depth - 1].children[letters[depth - 1]]
+
+    self.removed += 1
+    if self.removed >= self.compact_every:
+      self.compact()
+    return True
+
+  def compact(self):
+    """Rebuilds the children dicts, to free the room left by removed words."""
+    stack = [self]
+    while stack:
+      node = stack.pop()
+      node.children = dict(node.children)
+      stack.extend(node.children.values())
+    self.removed = 0
+
+  def count_prefix(self, prefix):
+    """Returns the number of words starting with 'prefix'."""
+    node = self[prefix]
+    return node.count if node else 0
+
+  def words_with_prefix(self, prefix, offset=0, limit=None):
+    """Returns the words starting with 'prefix' in alphabetical order, from
+    the number 'offset', and at most 'limit' of them.
+
+    The subtrees before 'offset' are skipped whole, by their count: a page
+    costs its own words, plus one count per skipped subtree."""
+    node, words = self[prefix], []
+    stack = [(node, prefix)] if node else []
+    while stack and (limit is None or len(words) < limit):
+      node, word = stack.pop()
+      if offset >= node.count:
+        offset -= node.count
+        continue
+      if node.full_word:
+        if offset:
+          offset -= 1
+        else:
+          words.append(word)
+      stack.extend((child, word + letter) for letter, child in
+                   sorted(node.children.items(), reverse=True))
+    return words
+
+  def dump(self, f):
+    """Writes the trie to the text file 'f', one line per node, in preorder.
+
+    A line is the letter of the node, '*' if it ends a word or '.' if not,
+    then its number of children; the line of the root has no letter. The
+    trie is walked with a stack of iterators, as deep as the longest word."""
+    f.write('%s%d\n' % ('*' if self.full_word else '.', len(self.children)))
+    stack = [iter(self.children.items())]
+    while stack:
+      for letter, node in stack[-1]:
+        f.write('%s%s%d\n' % (letter, '*' if node.full_word else '.',
+                              len(node.children)))
+        stack.append(iter(node.children.items()))
+        break
+      else:
+        stack.pop()
+
+  @classmethod
+  def load(cls, f):
+    """Returns the trie written by dump() to the text file 'f'.
+
+    The lines are read one at a time, and the counts of the nodes are summed
+    up once their last child is read."""
+    lines = iter(f)
+    line = next(lines)
+    root = cls()
+    root.full_word = line[0] == '*'
+    root.count = int(root.full_word)
+    # the nodes whose children are being read, with the number left to read.
+    stack = [(root, int(line[1:]))]
+    while stack:
+      node, left = stack[-1]
+      if not left:
+        stack.pop()
+        if stack:
+          stack[-1][0].count += node.count
+        continue
+      stack[-1] = node, left - 1
+      line = next(lines)
+      child = node.children[line[0]] = cls()
+      child.full_word = line[1] == '*'
+      child.count = int(child.full_word)
+      stack.append((child, int(line[2:])))
+    return root
+
+  def fuzzy(self, word, max_distance):
+    """Returns the (word, distance) pairs of the words at most 'max_distance'
+    Levenshtein edits away from 'word', closest first.
+
+    The trie is walked with one row of the edit distance table per node: the
+    row of a child is computed from the row of its parent in O(len(word)). A
+    branch is pruned once its row minimum exceeds max_distance, since the
+    distance can only grow deeper in the branch."""
+    found = []
+    stack = [(child, letter, range(len(word) + 1))
+             for letter, child in self.children.items()]
+    while stack:
+      node, prefix, above = stack.pop()
+      letter, row = prefix[-1], [above[0] + 1]
+      for i, expected in enumerate(word, 1):
+        row.append(min(row[i - 1] + 1, above[i] + 1,
+                       above[i - 1] + (letter != expected)))
+      if node.full_word and row[-1] <= max_distance:
+        found.append((prefix, row[-1]))
+      if min(row) <= max_distance:
+        stack.extend((child, prefix + letter, row)
+                     for letter, child in node.children.items())
+    return sorted(found, key=lambda pair: (pair[1], pair[0]))
+
+
+class TrieCursor:
+  """The Trie node reached by the letters read so far, None if none.
+
+  Like lexicon.Cursor, which boggle.py does not import so that it runs on
+  its own."""
+  __slots__ = ('node',)
+
+  def __init__(self, node):
+    self.node = node
+
+  def step(self, letter):
+    """Returns the cursor extended with 'letter'."""
+    if self.node is None:
+      return self
+    return TrieCursor(self.node.children.get(letter))
+
+  @property
+  def alive(self):
+    return self.node is not None
+
+  @property
+  def is_word(self):
+    return self.node is not None and self.node.full_word
+
 
 # run the unittest with python -m unittest wordsearch.py
+import io
+import random
+import tempfile
 import unittest
 
 class TestTrie(unittest.TestCase):
@@ -133,6 +753,111 @@ class TestTrie(unittest.TestCase):
       self.assertTrue(trie.is_prefix(word))
     self.assertFalse(trie['NoTfOuNd'])
 
+  def test_dump_load(self):
+    trie = Trie()
+    for word in 'car', 'card', 'cart', 'cat', 'dog', 'a' * 5000:
+      trie.add(word)
+    f = io.StringIO()
+    trie.dump(f)
+    self.assertEqual(f.getvalue().split('\n')[:6],
+                     ['.3', 'c.1', 'a.2', 'r*2', 'd*0', 't*0'])
+    f.seek(0)
+    loaded = Trie.load(f)
+    self.assertEqual(loaded.words_with_prefix(''), trie.words_with_prefix(''))
+    self.assertEqual(loaded.count_prefix('ca'), 4)
+    self.assertTrue(loaded.is_word('a' * 5000))
+    self.assertFalse(loaded.is_prefix('a' * 5001))
+
+    f = io.StringIO()
+    Trie().dump(f)
+    f.seek(0)
+    self.assertEqual(Trie.load(f).children, {})
+
+  def test_count_prefix(self):
+    trie = Trie()
+    for word in 'car', 'card', 'cart', 'cat', 'dog', 'car':
+      trie.add(word)
+    self.assertEqual(trie.count_prefix(''), 5)
+    self.assertEqual(trie.count_prefix('ca'), 4)
+    self.assertEqual(trie.count_prefix('car'), 3)
+    self.assertEqual(trie.count_prefix('cart'), 1)
+    self.assertEqual(trie.count_prefix('x'), 0)
+    trie.remove('car')
+    self.assertEqual(trie.count_prefix('car'), 2)
+    self.assertEqual(trie.count_prefix(''), 4)
+
+  def test_words_with_prefix(self):
+    trie = Trie()
+    for word in 'cat', 'card', 'car', 'dog', 'cart', 'ca':
+      trie.add(word)
+    self.assertEqual(trie.words_with_prefix(''),
+                     ['ca', 'car', 'card', 'cart', 'cat', 'dog'])
+    self.assertEqual(trie.words_with_prefix('car'), ['car', 'card', 'cart'])
+    self.assertEqual(trie.words_with_prefix('ca', 1, 2), ['car', 'card'])
+    self.assertEqual(trie.words_with_prefix('ca', 4, 2), ['cat'])
+    self.assertEqual(trie.words_with_prefix('', 5), ['dog'])
+    self.assertEqual(trie.words_with_prefix('ca', 5), [])
+    self.assertEqual(trie.words_with_prefix('x'), [])
+
+  def test_remove(self):
+    trie = Trie()
+    for word in 'car', 'card', 'cart', 'cat', 'dog':
+      trie.add(word)
+    self.assertTrue(trie.remove('card'))
+    self.assertFalse(trie.remove('card'))
+    self.assertFalse(trie.remove('ca'))
+    self.assertFalse(trie.remove('cards'))
+    self.assertFalse(trie.is_prefix('card'))
+    self.assertTrue(trie.is_word('cart'))
+
+    self.assertTrue(trie.remove('car'))  # car prefixes cart: no pruning.
+    self.assertTrue(trie.is_prefix('car'))
+    self.assertFalse(trie.is_word('car'))
+
+    self.assertTrue(trie.remove('dog'))
+    self.assertEqual(list(trie.children), ['c'])
+    for word in 'cart', 'cat':
+      trie.remove(word)
+    self.assertEqual(trie.children, {})
+
+  def test_compact(self):
+    trie = Trie()
+    trie.compact_every = 3
+    for word in 'car', 'card', 'cart', 'cat', 'cab':
+      trie.add(word)
+    for word in 'car', 'card':
+      trie.remove(word)
+    self.assertEqual(trie.removed, 2)
+    children = trie['ca'].children
+    trie.remove('cab')
+    self.assertEqual(trie.removed, 0)
+    self.assertIsNot(trie['ca'].children, children)
+    self.assertTrue(trie.is_word('cart'))
+    self.assertTrue(trie.is_word('cat'))
+
+  def test_fuzzy(self):
+    trie = Trie()
+    for word in 'car', 'card', 'cart', 'cat', 'act', 'dog':
+      trie.add(word)
+    self.assertEqual(trie.fuzzy('cat', 0), [('cat', 0)])
+    self.assertEqual(trie.fuzzy('cat', 1),
+                     [('cat', 0), ('car', 1), ('cart', 1)])
+    self.assertEqual(trie.fuzzy('cta', 2),
+                     [('act', 2), ('car', 2), ('cat', 2)])
+    self.assertEqual(trie.fuzzy('xyz', 2), [])
+
+  def test_cursor(self):
+    trie = Trie()
+    for word in 'car', 'card', 'cart', 'cat':
+      trie.add(word)
+    ca = trie.root_cursor().step('c').step('a')
+    self.assertTrue(ca.alive)
+    self.assertFalse(ca.is_word)
+    self.assertTrue(ca.step('r').is_word)
+    self.assertTrue(ca.step('r').step('t').is_word)
+    self.assertFalse(ca.step('r').step('s').alive)
+    self.assertFalse(ca.step('x').step('t').alive)
+
 
 class TestBuggles(unittest.TestCase):
 
@@ -161,4 +886,215 @@ class TestBuggles(unittest.TestCase):
     for word in word_list:
       self.assertIn(word, words)
 
+  def test_adjacency(self):
+    offsets, neighbors = adjacency(2, 3)
+    self.assertEqual(list(offsets), [0, 3, 8, 11, 14, 19, 22])
+    self.assertEqual(sorted(neighbors[offsets[0]:offsets[1]]), [1, 3, 4])
+    self.assertEqual(sorted(neighbors[offsets[4]:offsets[5]]),
+                     [0, 1, 2, 3, 5])
+    offsets, neighbors = adjacency(2, 3, 4)
+    self.assertEqual(sorted(neighbors[offsets[4]:offsets[5]]), [1, 3, 5])
+    self.assertIs(Grid('abc', 'def', lexicon=True).adjacent,
+                  adjacency(2, 3, 8)[1])
+    with self.assertRaises(ValueError):
+      adjacency(2, 3, 6)
+
+  def test_traversals(self):
+    lexicon = Trie()
+    for word in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad', 'a', 'dart', 'caca']:
+      lexicon.add(word)
+    grid = Grid('aar', 'tcd', lexicon=lexicon)
+    self.assertEqual(sorted(grid.words('bitmask')),
+                     sorted(grid.words('paths')))
+    self.assertIn('a', grid.words('bitmask'))
+    self.assertNotIn('caca', grid.words('bitmask'))
+    self.assertEqual(sorted(grid.words('stack')),
+                     sorted(grid.words('paths')))
+    with self.assertRaises(ValueError):
+      grid.words('diagonal')
+    with self.assertRaises(ValueError):
+      grid.words('bitmask', max_length=3)
+
+  def test_stack_max_length(self):
+    lexicon = Trie()
+    for word in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad', 'a']:
+      lexicon.add(word)
+    grid = Grid('aar', 'tcd', lexicon=lexicon)
+    self.assertEqual(sorted(grid.words('stack', max_length=2)),
+                     ['a', 'ac', 'ad'])
+    self.assertEqual(grid.words('stack', max_length=1), ['a'])
+    self.assertEqual(grid.words('stack', max_length=0), [])
+    self.assertEqual(len(grid.words('stack', max_length=3)), 12)
+
+  def test_stack_large_grid(self):
+    lexicon = Trie()
+    lexicon.add('ab' * 600)  # deeper than the recursion limit.
+    lexicon.add('abba')
+    grid = Grid(*['x' * 100] * 99 + ['abba' + 'x' * 96], lexicon=lexicon)
+    self.assertEqual(grid.words('stack'), ['abba'])
+    self.assertEqual(grid.words('stack', max_length=3), [])
+    row = Grid('ab' * 600, lexicon=lexicon)
+    self.assertEqual(row.words('stack'), ['ab' * 600])
+
+  def test_workers(self):
+    lexicon = Trie()
+    for word in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']:
+      lexicon.add(word)
+    grid = Grid('aart', 'tcdr', 'acta', lexicon=lexicon)
+    expected = sorted(grid.words())
+    for traversal in 'bitmask', 'paths', 'stack':
+      self.assertEqual(sorted(grid.words(traversal, workers=2)), expected)
+
+  def test_workers_shared_lexicon(self):
+    from lexicon import ArrayTrie, SharedLexicon
+    trie = ArrayTrie()
+    for word in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']:
+      trie.add(word)
+    lexicon = SharedLexicon.create(trie)
+    try:
+      grid = Grid('aart', 'tcdr', 'acta', lexicon=lexicon)
+      self.assertEqual(sorted(grid.words(workers=3)), sorted(grid.words()))
+    finally:
+      lexicon.close()
+
+  def test_solve_many(self):
+    lexicon = Trie()
+    for word in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']:
+      lexicon.add(word)
+    boards = [('aar', 'tcd'), ('aart', 'tcdr', 'acta'), ('xyz',), ('ac',)]
+    expected = {i: sorted(Grid(*rows, lexicon=lexicon).words())
+                for i, rows in enumerate(boards)}
+    solved = {i: sorted(words) for i, words in solve_many(boards, lexicon)}
+    self.assertEqual(solved, expected)
+
+    solved = solve_many(iter(boards * 3), lexicon, workers=2, max_in_flight=3)
+    solved = [(i, sorted(words)) for i, words in solved]
+    self.assertEqual(sorted(solved),
+                     sorted((i, expected[i % 4]) for i in range(12)))
+
+    solved = solve_many(iter(boards * 2), lexicon, traversal='stack')
+    self.assertEqual([(i, sorted(words)) for i, words in solved],
+                     [(i, expected[i % 4]) for i in range(8)])
+    frames = {}
+    _solve(boards[1], lexicon, 'stack', frames)
+    reused = frames[3, 4]
+    _solve(boards[1], lexicon, 'stack', frames)
+    self.assertIs(frames[3, 4], reused)
+
+    solved = solve_many({'b': boards[1]}, lexicon, workers=1)
+    self.assertEqual([(i, sorted(words)) for i, words in solved],
+                     [('b', expected[1])])
+
+  def test_board_pruner(self):
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']
+    pruner = BoardPruner(word_list + ['dart', 'acta', 'tact', 'cab', 'tr'],
+                         max_share=1)
+    # 'rt' is not adjacent for dart and tr, tact: one 't' only, cab: no 'b'.
+    self.assertEqual(sorted(pruner.words('aar', 'tcd')),
+                     sorted(word_list + ['acta']))
+    lexicon = pruner.lexicon('aar', 'tcd')
+    self.assertEqual(sorted(Grid('aar', 'tcd', lexicon=lexicon).words()),
+                     sorted(word_list + ['acta']))
+    self.assertFalse(lexicon.is_word('dart'))
+
+    # 14 words of 18 may be on the board: the full lexicon is searched.
+    pruner.max_share = 0.5
+    full = pruner.lexicon('aar', 'tcd')
+    self.assertTrue(full.is_word('dart'))
+    # 9 words of 18 may be on this one, not more than max_share.
+    lexicon = pruner.lexicon('tr', 'ac')
+    self.assertIsNot(lexicon, full)
+    self.assertEqual(sorted(Grid('tr', 'ac', lexicon=lexicon).words()),
+                     sorted(Grid('tr', 'ac', lexicon=full).words()))
+    full = Trie()
+    for word in word_list:
+      full.add(word)
+    pruner = BoardPruner(word_list, lexicon=full, max_share=0.5)
+    self.assertIs(pruner.lexicon('aar', 'tcd', 'bbb'), full)
+    self.assertIsNot(pruner.lexicon('xyz'), full)
+
+  def test_set_cell(self):
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad', 'dart', 'trad', 'tact']
+    rng = random.Random(0)
+    for lexicon in self._lexicons(word_list):
+      grid = Grid('aar', 'tcd', 'rta', lexicon=lexicon)
+      words = set(grid.solve())
+      self.assertEqual(words, set(grid.words()))
+      for _ in range(30):
+        position = rng.randrange(3), rng.randrange(3)
+        lost, gained = grid.set_cell(position, rng.choice('acdrt'))
+        expected = set(Grid(*grid.grid, lexicon=lexicon).words())
+        self.assertEqual(set(grid.index), expected)
+        self.assertEqual(lost, words - expected)
+        self.assertEqual(gained, expected - words)
+        words = expected
+      for word, paths in grid.index.items():
+        for path in paths:
+          self.assertEqual(''.join(grid.cell_letters[c] for c in path), word)
+      for letter in '', 'ab':
+        with self.assertRaises(ValueError):
+          grid.set_cell((0, 0), letter)
+
+  def _lexicons(self, word_list):
+    from lexicon import ArrayTrie, CodedTrie
+    trie, array_trie = Trie(), ArrayTrie()
+    for word in word_list:
+      trie.add(word)
+      array_trie.add(word)
+    return trie, array_trie, CodedTrie.from_words(word_list)
+
+  def test_busiest_first(self):
+    cells = Grid('abcd', 'efgh', 'ijkl', 'mnop', lexicon=True)._busiest_first()
+    self.assertEqual(sorted(cells[:4]), [5, 6, 9, 10])
+    self.assertEqual(sorted(cells[-4:]), [0, 3, 12, 15])
+
+  def test_words_array_trie(self):
+    from lexicon import ArrayTrie
+    lexicon = ArrayTrie()
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']
+    for word in word_list:
+      lexicon.add(word)
+
+    words = Grid('aar', 'tcd', lexicon=lexicon).words()
+    self.assertEqual(sorted(words), sorted(word_list))
+
+  def test_words_dawg(self):
+    from lexicon import Dawg
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']
+    words = Grid('aar', 'tcd', lexicon=Dawg.from_words(sorted(word_list)))
+    self.assertEqual(sorted(words.words()), sorted(word_list))
+
+  def test_words_coded_trie(self):
+    from lexicon import CodedTrie
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']
+    lexicon = CodedTrie.from_words(word_list)
+    words = Grid('aar', 'tcd', lexicon=lexicon).words()
+    self.assertEqual(sorted(words), sorted(word_list))
+    words = Grid('aar', 'txd', lexicon=lexicon).words()  # x is not coded.
+    self.assertEqual(sorted(words), ['ad', 'data', 'rat', 'tad', 'tar'])
+
+  def test_words_snapshot(self):
+    word_list = ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'words')
+      with open(path, 'w') as f:
+        f.write('\n'.join(word_list + ["cat's", 'a']))
+      snapshot = os.path.join(directory, 'lexicon.trie')
+      for _ in range(2):  # builds the snapshot, then maps it.
+        lexicon = load_lexicon(path=path, snapshot=snapshot)
+        words = Grid('aar', 'tcd', lexicon=lexicon).words()
+        self.assertEqual(sorted(words), sorted(word_list))
+        lexicon.close()
+
 
@@ -0,0 +1,117 @@
+"""Benchmarks the traversals of the Boggle Grid, on boards of growing sizes.
+
+The boards are square, 5x5 to 10x10 by default, and their letters are drawn
+with the frequencies of the letters of the dictionary. Each traversal solves
+the same boards with the same lexicon, and must find the same words. The
+'pruned' traversal is the bitmask one, on the sub-lexicon of the board built
+by a BoardPruner: its time includes the pre-pass. The pruned sub-lexicons
+are Tries, so the pre-pass pays the most in front of a slower lexicon, like
+--lexicon Dawg, on the small boards: on the large ones, the pruner falls
+back to the full lexicon.
+
+The results are printed as JSON, like lexicon_bench.py:
+$ python3 boggle_bench.py > before.json
+$ python3 boggle_bench.py --dictionary /path/to/words --boards 3 \\
+    --sizes 5 6 --traversals bitmask
+$ python3 boggle_bench.py --lexicon Dawg --sizes 3 4 5 6 \\
+    --traversals bitmask pruned
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import boggle
+import lexicon as lexicons
+from trie_class import added
+
+TRAVERSALS = ['paths', 'bitmask', 'stack', 'pruned']
+
+# The lexicons searched by the traversals, by name: a builder takes the words.
+LEXICONS = {
+    'Trie': added(boggle.Trie),
+    'ArrayTrie': added(lexicons.ArrayTrie),
+    'Dawg': lambda words: lexicons.Dawg.from_words(sorted(set(words))),
+}
+
+
+def boards(words, size, count, seed=0):
+  """Returns 'count' boards of size x size letters, as lists of rows."""
+  rng, letters = random.Random(seed), ''.join(words)
+  return [[''.join(rng.choice(letters) for _ in range(size))
+           for _ in range(size)] for _ in range(count)]
+
+
+def measure(lexicon, rows_list, traversal, pruner):
+  """Returns the seconds taken by each board, and the words found."""
+  seconds, found = [], []
+  for rows in rows_list:
+    start = time.perf_counter()
+    if traversal == 'pruned':
+      grid = boggle.Grid(*rows, lexicon=pruner.lexicon(*rows))
+      found.append(sorted(grid.words('bitmask')))
+    else:
+      grid = boggle.Grid(*rows, lexicon=lexicon)
+      found.append(sorted(grid.words(traversal)))
+    seconds.append(time.perf_counter() - start)
+  return seconds, found
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--dictionary', default=boggle.DICTIONARY)
+  parser.add_argument('--boards', type=int, default=5,
+                      help='number of boards of each size')
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=list(range(5, 11)))
+  parser.add_argument('--lexicon', choices=LEXICONS, default='Trie')
+  parser.add_argument('--traversals', nargs='+', choices=TRAVERSALS,
+                      default=TRAVERSALS)
+  parser.add_argument('--output', help='JSON file, instead of stdout')
+  args = parser.parse_args(argv)
+
+  words = list(boggle.dictionary_words(args.dictionary))
+  lexicon = LEXICONS[args.lexicon](words)
+  pruner = (boggle.BoardPruner(words, lexicon=lexicon)
+            if 'pruned' in args.traversals else None)
+
+  results = {}
+  for size in args.sizes:
+    rows_list, expected = boards(words, size, args.boards), None
+    for traversal in args.traversals:
+      print('measuring %s on %dx%d...' % (traversal, size, size),
+            file=sys.stderr)
+      seconds, found = measure(lexicon, rows_list, traversal, pruner)
+      if expected is None:
+        expected = found
+      elif found != expected:
+        raise AssertionError('%s found other words on %dx%d'
+                             % (traversal, size, size))
+      results.setdefault('%dx%d' % (size, size), {})[traversal] = {
+          'seconds_per_board': sum(seconds) / len(seconds),
+          'max_seconds': max(seconds),
+          'words_per_board': sum(map(len, found)) / len(found),
+      }
+
+  report = {
+      'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'dictionary': args.dictionary,
+      'lexicon': args.lexicon,
+      'words': len(words),
+      'boards': args.boards,
+      'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+  main()
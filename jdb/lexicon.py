@@ -0,0 +1,1012 @@
+"""Compact lexicons for the Boggle solver.
+
+The Trie in boggle.py allocates one Python object and one dict per node: on
+the full /usr/share/dict/american-english, it costs hundreds of megabytes. The
+lexicons in this module keep the same interface (add, is_word, is_prefix and
+__getitem__) so that a Grid can use them unchanged, but they store the nodes in
+flat arrays of machine integers.
+"""
+
+import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+from multiprocessing import shared_memory
+
+# A snapshot is the header, then the 4 arrays of an ArrayTrie, in the byte
+# order of the machine which wrote it: letters, first_child, next_sibling as
+# 4-byte unsigned integers, then full_word as bytes.
+SNAPSHOT_MAGIC = b'TRIE'
+_HEADER = struct.Struct('=4sI')  # magic, number of nodes.
+_NODE_BYTES = sum(struct.calcsize(typecode) for typecode in 'IIIB')
+
+
+def _snapshot_views(buffer):
+  """Returns the 4 arrays of the snapshot in buffer, as memoryviews.
+
+  Nothing is copied: the views index the bytes of the buffer."""
+  view = memoryview(buffer)
+  try:
+    if len(view) < _HEADER.size:
+      raise ValueError('Not a lexicon snapshot: %r' % bytes(view))
+    magic, size = _HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC:
+      raise ValueError('Not a lexicon snapshot: %r' % bytes(magic))
+    # a shared memory block may be longer, rounded up to a page.
+    if len(view) < _HEADER.size + size * _NODE_BYTES:
+      raise ValueError('Truncated lexicon snapshot: %d bytes for %d nodes'
+                       % (len(view), size))
+  except ValueError:
+    view.release()
+    raise
+  views, offset = [view], _HEADER.size
+  for typecode in 'IIIB':
+    end = offset + size * struct.calcsize(typecode)
+    views.append(view[offset:end].cast(typecode))
+    offset = end
+  return views
+
+
+class ArrayTrie:
+  """A trie stored as a 'first child, next sibling' tree in 4 flat arrays.
+
+  The node number 0 is the root. For the node number i:
+  - letters[i] is the code point of the letter leading to node i,
+  - first_child[i] is the node number of its first child, 0 if none,
+  - next_sibling[i] is the node number of its next sibling, 0 if none,
+  - full_word[i] is 1 if the letters from the root to node i make a word.
+
+  The root is never a child, nor a sibling, so 0 can stand for 'no node'.
+  Siblings are sorted by letter, so a lookup can stop early on a miss. A node
+  costs 13 bytes, instead of a Trie instance plus its children dict.
+  """
+
+  def __init__(self):
+    self.letters = array('I', [0])
+    self.first_child = array('I', [0])
+    self.next_sibling = array('I', [0])
+    self.full_word = array('B', [0])
+
+  def _child(self, node, code):
+    """Returns the child of 'node' reached with the letter 'code', or 0."""
+    letters, child = self.letters, self.first_child[node]
+    while child and letters[child] < code:
+      child = self.next_sibling[child]
+    return child if child and letters[child] == code else 0
+
+  def add(self, letters):
+    if not letters:
+      return  # the empty string is not a word, as in a Trie.
+    node = 0
+    for letter in letters:
+      code = ord(letter)
+      previous, child = 0, self.first_child[node]
+      while child and self.letters[child] < code:
+        previous, child = child, self.next_sibling[child]
+      if not child or self.letters[child] != code:
+        # the new node is linked between 'previous' and 'child'.
+        new = len(self.letters)
+        self.letters.append(code)
+        self.first_child.append(0)
+        self.next_sibling.append(child)
+        self.full_word.append(0)
+        if previous:
+          self.next_sibling[previous] = new
+        else:
+          self.first_child[node] = new
+        child = new
+      node = child
+    self.full_word[node] = 1
+
+  def __getitem__(self, letters):
+    """Returns the node number reached by 'letters', False if not found.
+
+    The root is the node 0: test the result with 'is not False'."""
+    node = 0
+    for letter in letters:
+      node = self._child(node, ord(letter))
+      if not node:
+        return False
+    return node
+
+  def is_word(self, letters):
+    node = self[letters]
+    return node is not False and bool(self.full_word[node])
+
+  def is_prefix(self, letters):
+    return self[letters] is not False
+
+  def root_cursor(self):
+    return Cursor(self)
+
+  def __len__(self):
+    """Returns the number of nodes, the root included."""
+    return len(self.letters)
+
+  def nbytes(self):
+    """Returns the size of the 4 arrays, in bytes."""
+    return sum(a.itemsize * len(a) for a in
+               (self.letters, self.first_child, self.next_sibling,
+                self.full_word))
+
+  def to_bytes(self):
+    """Returns the snapshot of the trie, see MappedLexicon."""
+    return b''.join([_HEADER.pack(SNAPSHOT_MAGIC, len(self.letters)),
+                     self.letters.tobytes(), self.first_child.tobytes(),
+                     self.next_sibling.tobytes(), self.full_word.tobytes()])
+
+  def save(self, path):
+    """Writes the snapshot of the trie to 'path', see MappedLexicon."""
+    # The file is renamed once complete, so concurrent readers never map a
+    # partial snapshot.
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as f:
+      f.write(self.to_bytes())
+    os.replace(temporary, path)
+
+
+class Cursor:
+  """The node of an ArrayTrie or a Dawg reached by the letters read so far.
+
+  A Grid extends a word one letter at a time: step() moves from a node to its
+  child, instead of walking all the letters down from the root again. A
+  cursor is immutable, so backtracking is just reusing the previous cursor.
+  """
+  __slots__ = ('lexicon', 'node')
+
+  def __init__(self, lexicon, node=0):
+    self.lexicon, self.node = lexicon, node
+
+  def step(self, letter):
+    """Returns the cursor extended with 'letter'."""
+    if self.node is None:
+      return self
+    child = self.lexicon._child(self.node, ord(letter))
+    return Cursor(self.lexicon, child if child else None)
+
+  @property
+  def alive(self):
+    """True if the letters read so far prefix at least one word."""
+    return self.node is not None
+
+  @property
+  def is_word(self):
+    """True if the letters read so far make a word."""
+    return self.node is not None and bool(self.lexicon.full_word[self.node])
+
+
+class MappedLexicon(ArrayTrie):
+  """A read-only ArrayTrie, mapped in memory from a snapshot file.
+
+  Opening a snapshot costs no parsing and no copy: the lookups index the
+  mapped bytes directly, and the pages are loaded lazily by the kernel. The
+  processes mapping the same file share the same pages of the page cache.
+
+    >>> load_lexicon(ArrayTrie).save('lexicon.trie')  # once.
+    >>> grid = Grid('aar', 'tcd', lexicon=MappedLexicon('lexicon.trie'))
+  """
+
+  def __init__(self, path):
+    with open(path, 'rb') as f:
+      self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      self._attach(self._mmap)
+    except Exception:
+      self._mmap.close()
+      raise
+
+  def _attach(self, buffer):
+    self._views = _snapshot_views(buffer)
+    (self.letters, self.first_child, self.next_sibling,
+     self.full_word) = self._views[1:]
+
+  def add(self, letters):
+    raise TypeError('A %s is read-only.' % type(self).__name__)
+
+  def close(self):
+    """Unmaps the snapshot. The lexicon can not be used anymore."""
+    for view in reversed(self._views):
+      view.release()
+    self._mmap.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+class SharedLexicon(MappedLexicon):
+  """A read-only ArrayTrie in a multiprocessing.shared_memory block.
+
+  The process which builds the lexicon copies its snapshot into a shared
+  memory block, once, with create(). Other processes attach to the block by
+  name: they all query the same physical pages, so N workers do not hold N
+  copies of the lexicon. A SharedLexicon pickles as the name of its block,
+  so it can be passed to the workers of a multiprocessing.Pool as is:
+
+    >>> lexicon = SharedLexicon.create(load_lexicon(ArrayTrie))
+    >>> pool.map(solve, [(board, lexicon) for board in boards])
+    >>> lexicon.close()  # the creator also frees the block.
+
+  The workers should be children of the creator: they share its resource
+  tracker, which frees the block if the creator dies without closing it.
+  """
+
+  def __init__(self, name):
+    self._shm, self._owner = shared_memory.SharedMemory(name=name), False
+    self._attach(self._shm.buf)
+
+  @classmethod
+  def create(cls, trie):
+    """Returns a SharedLexicon holding a copy of the ArrayTrie 'trie'."""
+    snapshot = trie.to_bytes()
+    shm = shared_memory.SharedMemory(create=True, size=len(snapshot))
+    shm.buf[:len(snapshot)] = snapshot
+    lexicon = cls.__new__(cls)
+    lexicon._shm, lexicon._owner = shm, True
+    lexicon._attach(shm.buf)
+    return lexicon
+
+  @property
+  def name(self):
+    return self._shm.name
+
+  def __reduce__(self):
+    return SharedLexicon, (self.name,)
+
+  def close(self):
+    """Detaches from the block, and frees it if this is the creator."""
+    for view in reversed(self._views):
+      view.release()
+    self._shm.close()
+    if self._owner:
+      self._shm.unlink()
+
+
+def _build_shard(words):
+  """Returns the snapshot of the ArrayTrie of words, in a pool worker."""
+  trie = ArrayTrie()
+  for word in words:
+    trie.add(word)
+  return trie.to_bytes()
+
+
+def stitch(snapshots):
+  """Returns the ArrayTrie merging the snapshots of tries of disjoint words.
+
+  The words of a snapshot must all start with letters lower than the first
+  letters of the words of the next snapshot: the children of the roots are
+  chained under one root, in order, so the siblings stay sorted."""
+  trie, last_top = ArrayTrie(), 0
+  for snapshot in snapshots:
+    _, letters, first_child, next_sibling, full_word = _snapshot_views(
+        snapshot)
+    if len(letters) == 1:
+      continue
+    # the node i > 0 of the shard is the node base + i of the trie.
+    base = len(trie.letters) - 1
+    trie.letters.extend(letters[1:])
+    trie.first_child.extend(i + base if i else 0 for i in first_child[1:])
+    trie.next_sibling.extend(i + base if i else 0 for i in next_sibling[1:])
+    trie.full_word.extend(full_word[1:])
+
+    top = first_child[0] + base
+    if last_top:
+      trie.next_sibling[last_top] = top
+    else:
+      trie.first_child[0] = top
+    while trie.next_sibling[top]:
+      top = trie.next_sibling[top]
+    last_top = top
+  return trie
+
+
+def build_sharded(words, workers=None):
+  """Returns the ArrayTrie of words, built by a pool of 'workers' processes.
+
+  The words are split by first letter in 'workers' shards of about the same
+  size, and the sub-tries are built in parallel. The workers send back their
+  snapshot, which stitch() chains under one root.
+
+    >>> build_sharded(dictionary_words(), workers=8).save('lexicon.trie')
+  """
+  workers = workers or os.cpu_count()
+  by_letter = {}
+  for word in words:
+    if word:
+      by_letter.setdefault(word[0], []).append(word)
+
+  shards, size = [[]], sum(map(len, by_letter.values())) / workers
+  for letter in sorted(by_letter):
+    if len(shards[-1]) >= size:
+      shards.append([])
+    shards[-1].extend(by_letter[letter])
+
+  with multiprocessing.Pool(min(workers, len(shards))) as pool:
+    return stitch(pool.map(_build_shard, shards))
+
+
+class _State:
+  """A state of a Dawg under construction."""
+  __slots__ = ('final', 'edges')
+
+  def __init__(self):
+    self.final, self.edges = False, {}
+
+  def key(self):
+    """Two states with the same key recognize the same suffixes."""
+    return self.final, tuple((l, id(s)) for l, s in self.edges.items())
+
+
+class Dawg:
+  """A minimal deterministic acyclic automaton: a trie sharing its suffixes.
+
+  A trie shares the prefixes of the words, a Dawg also shares their suffixes:
+  -ing, -tion or -ness are stored once, instead of thousands of times. It is
+  built in one incremental pass over sorted words (Daciuk et al., 2000):
+  - add() appends the suffix of the word not shared with the previous word,
+  - the states of the previous word which can no longer change are replaced
+    by an equivalent state from the register, when there is one.
+
+  Once finish() is called, the automaton is frozen into flat arrays: the edges
+  of the state number s are edge_letters[i] -> edge_targets[i] for i in
+  range(first_edge[s], first_edge[s + 1]), sorted by letter. The state number
+  0 is the root, and full_word[s] is 1 if the state s ends a word.
+
+    >>> dawg = Dawg.from_words(sorted(dictionary_words()))
+  """
+
+  def __init__(self):
+    self._root, self._previous = _State(), ''
+    self._unchecked = []  # (parent, letter, child) along the previous word.
+    self._register = {}
+
+  @classmethod
+  def from_words(cls, sorted_words):
+    dawg = cls()
+    for word in sorted_words:
+      dawg.add(word)
+    dawg.finish()
+    return dawg
+
+  def add(self, word):
+    """Adds a word, which must not be lower than the previous one."""
+    if self._register is None:
+      raise ValueError('The Dawg is frozen, no word can be added.')
+    if not word:
+      return  # the empty string is not a word, as in a Trie.
+    if word < self._previous:
+      raise ValueError('Words must be added in order: %r after %r'
+                       % (word, self._previous))
+    common = 0
+    for a, b in zip(word, self._previous):
+      if a != b:
+        break
+      common += 1
+    self._minimize(common)
+
+    state = self._unchecked[-1][2] if self._unchecked else self._root
+    for letter in word[common:]:
+      child = _State()
+      state.edges[letter] = child
+      self._unchecked.append((state, letter, child))
+      state = child
+    state.final = True
+    self._previous = word
+
+  def _minimize(self, down_to):
+    """Merges the unchecked states deeper than 'down_to' with the register."""
+    while len(self._unchecked) > down_to:
+      parent, letter, child = self._unchecked.pop()
+      key = child.key()
+      if key in self._register:
+        parent.edges[letter] = self._register[key]
+      else:
+        self._register[key] = child
+
+  def finish(self):
+    """Minimizes the last word and freezes the automaton into arrays."""
+    self._minimize(0)
+    self._register = None
+
+    numbers, states, stack = {id(self._root): 0}, [self._root], [self._root]
+    while stack:
+      for child in stack.pop().edges.values():
+        if id(child) not in numbers:
+          numbers[id(child)] = len(states)
+          states.append(child)
+          stack.append(child)
+
+    self.first_edge, self.full_word = array('I'), array('B')
+    self.edge_letters, self.edge_targets = array('I'), array('I')
+    for state in states:
+      self.first_edge.append(len(self.edge_letters))
+      self.full_word.append(state.final)
+      for letter, child in sorted(state.edges.items()):
+        self.edge_letters.append(ord(letter))
+        self.edge_targets.append(numbers[id(child)])
+    self.first_edge.append(len(self.edge_letters))
+    self._root = self._unchecked = None
+
+  def _child(self, state, code):
+    """Returns the state reached from 'state' with the letter 'code', or 0.
+
+    The root has no incoming edge, so 0 can stand for 'no state'."""
+    edge_letters = self.edge_letters
+    for edge in range(self.first_edge[state], self.first_edge[state + 1]):
+      if edge_letters[edge] >= code:
+        return self.edge_targets[edge] if edge_letters[edge] == code else 0
+    return 0
+
+  def __getitem__(self, letters):
+    """Returns the state number reached by 'letters', False if not found."""
+    state = 0
+    for letter in letters:
+      state = self._child(state, ord(letter))
+      if not state:
+        return False
+    return state
+
+  def is_word(self, letters):
+    state = self[letters]
+    return state is not False and bool(self.full_word[state])
+
+  def is_prefix(self, letters):
+    return self[letters] is not False
+
+  def info(self, letters):
+    """is_prefix and is_word in one traversal."""
+    state = self[letters]
+    if state is False:
+      return False, False
+    return True, bool(self.full_word[state])
+
+  def root_cursor(self):
+    return Cursor(self)
+
+  def __len__(self):
+    """Returns the number of states."""
+    return len(self.full_word)
+
+  def nbytes(self):
+    """Returns the size of the 4 arrays, in bytes."""
+    return sum(a.itemsize * len(a) for a in
+               (self.first_edge, self.full_word, self.edge_letters,
+                self.edge_targets))
+
+
+class Alphabet:
+  """Maps the symbols of a dictionary to dense small integers, once.
+
+  The symbols are numbered 1 to len(alphabet) - 1, in sorted order. The code 0
+  stands for any symbol out of the alphabet: a CodedTrie has no child there.
+  """
+
+  def __init__(self, symbols):
+    self.symbols = [''] + sorted(set(symbols) - {''})
+    self.codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+    del self.codes['']
+
+  @classmethod
+  def from_words(cls, words):
+    symbols = set()
+    for word in words:
+      symbols.update(word)
+    return cls(symbols)
+
+  def __len__(self):
+    """Returns the number of codes, 0 included."""
+    return len(self.symbols)
+
+  def encode(self, string):
+    """Returns the codes of the symbols of 'string', as a tuple."""
+    codes = self.codes
+    return tuple(codes.get(symbol, 0) for symbol in string)
+
+  def decode(self, codes):
+    return ''.join(self.symbols[code] for code in codes)
+
+
+class CodedTrie:
+  """A trie whose nodes are fixed-width child tables, indexed by symbol code.
+
+  The letters are encoded once by the Alphabet of the words: the child of the
+  node number i for the code c is children[i * width + c], 0 if none, and
+  full_word[i] is 1 if node i ends a word. A step is one multiplication and
+  one array indexing, instead of hashing a letter or scanning siblings, at
+  the cost of 4 * width bytes per node.
+
+  A Grid encodes its letters with the same alphabet, and steps its cursors
+  with codes: see CodedCursor.
+  """
+
+  def __init__(self, alphabet):
+    self.alphabet, self.width = alphabet, len(alphabet)
+    self._empty_table = array('I', [0]) * self.width
+    self.children = array('I', self._empty_table)
+    self.full_word = bytearray(1)
+
+  @classmethod
+  def from_words(cls, words):
+    words = list(words)
+    trie = cls(Alphabet.from_words(words))
+    for word in words:
+      trie.add(word)
+    return trie
+
+  def add(self, letters):
+    if not letters:
+      return  # the empty string is not a word, as in a Trie.
+    children, width, node = self.children, self.width, 0
+    for code in self.alphabet.encode(letters):
+      if not code:
+        raise ValueError('%r is not in the alphabet of the trie' % letters)
+      child = children[node * width + code]
+      if not child:
+        child = len(self.full_word)
+        children[node * width + code] = child
+        children.extend(self._empty_table)
+        self.full_word.append(0)
+      node = child
+    self.full_word[node] = 1
+
+  def __getitem__(self, letters):
+    """Returns the node number reached by 'letters', False if not found."""
+    children, width, node = self.children, self.width, 0
+    for code in self.alphabet.encode(letters):
+      node = children[node * width + code]
+      if not node:
+        return False
+    return node
+
+  def is_word(self, letters):
+    node = self[letters]
+    return node is not False and bool(self.full_word[node])
+
+  def is_prefix(self, letters):
+    return self[letters] is not False
+
+  def root_cursor(self):
+    return CodedCursor(self)
+
+  def __len__(self):
+    """Returns the number of nodes, the root included."""
+    return len(self.full_word)
+
+  def nbytes(self):
+    """Returns the size of the child tables and the word flags, in bytes."""
+    return self.children.itemsize * len(self.children) + len(self.full_word)
+
+
+class CodedCursor:
+  """A Cursor on a CodedTrie, which steps with the codes of its alphabet."""
+  __slots__ = ('trie', 'node')
+
+  def __init__(self, trie, node=0):
+    self.trie, self.node = trie, node
+
+  def step(self, code):
+    """Returns the cursor extended with the symbol number 'code'."""
+    if self.node is None:
+      return self
+    trie = self.trie
+    child = trie.children[self.node * trie.width + code]
+    return CodedCursor(trie, child if child else None)
+
+  @property
+  def alive(self):
+    """True if the letters read so far prefix at least one word."""
+    return self.node is not None
+
+  @property
+  def is_word(self):
+    """True if the letters read so far make a word."""
+    return self.node is not None and bool(self.trie.full_word[self.node])
+
+
+def _bloom_hash(string):
+  """Returns a 64 bits hash of 'string', stable across processes."""
+  digest = hashlib.blake2b(string.encode(), digest_size=8).digest()
+  return int.from_bytes(digest, 'little')
+
+
+class BloomLexicon:
+  """A Bloom filter in front of a lexicon, for the is_word() misses.
+
+  The words set 'hashes' bits of a bytearray: a string with one of its bits
+  unset is a definite miss, answered without touching the lexicon. The other
+  strings are checked by the lexicon, which the filter only wrongly lets
+  through with a probability about 'error_rate'. The filter is sized for the
+  words given at creation, its error rate grows beyond.
+
+  The bits of a string are (h1 + i * h2) % size for i in range(hashes), with
+  h1 and h2 the two halves of a 64 bits BLAKE2 digest of its UTF-8 bytes:
+  unlike hash(), it is the same in every process, so a filter can be
+  pickled.
+
+  The other methods, like is_prefix() or root_cursor(), are the lexicon's.
+  """
+
+  def __init__(self, lexicon, words, error_rate=0.01):
+    words = list(words)
+    self.lexicon, self.error_rate = lexicon, error_rate
+    self.size = max(8, math.ceil(
+        -len(words) * math.log(error_rate) / math.log(2) ** 2))
+    self.hashes = max(1, round(self.size / max(1, len(words)) * math.log(2)))
+    self.bits = bytearray((self.size + 7) // 8)
+    self.lookups = self.rejected = self.false_positives = 0
+    for word in words:
+      self._set(word)
+
+  def _set(self, string):
+    h = _bloom_hash(string)
+    position, step = h & 0xFFFFFFFF, (h >> 32) | 1
+    size, bits = self.size, self.bits
+    for _ in range(self.hashes):
+      position %= size
+      bits[position >> 3] |= 1 << (position & 7)
+      position += step
+
+  def __contains__(self, string):
+    """False if 'string' is surely not a word, True if it may be one."""
+    # The probes stop at the first unset bit: a miss costs one or two.
+    h = _bloom_hash(string)
+    position, step = h & 0xFFFFFFFF, (h >> 32) | 1
+    size, bits = self.size, self.bits
+    for _ in range(self.hashes):
+      position %= size
+      if not bits[position >> 3] & (1 << (position & 7)):
+        return False
+      position += step
+    return True
+
+  def add(self, letters):
+    self._set(letters)
+    self.lexicon.add(letters)
+
+  def is_word(self, letters):
+    self.lookups += 1
+    if letters not in self:
+      self.rejected += 1
+      return False
+    found = self.lexicon.is_word(letters)
+    if not found:
+      self.false_positives += 1
+    return found
+
+  def __getattr__(self, name):
+    # pickle and copy look up attributes before 'lexicon' is set: only the
+    # public names are delegated.
+    if name == 'lexicon' or name.startswith('_'):
+      raise AttributeError(name)
+    return getattr(self.lexicon, name)
+
+  def stats(self):
+    """Returns the counts of the is_word() lookups, and the sizing of the
+    filter: the observed false positive rate is the share of the misses
+    which the filter let through."""
+    misses = self.rejected + self.false_positives
+    return {
+        'lookups': self.lookups,
+        'rejected': self.rejected,
+        'false_positives': self.false_positives,
+        'rejection_rate': self.rejected / self.lookups if self.lookups else 0,
+        'false_positive_rate': self.false_positives / misses if misses else 0,
+        'error_rate': self.error_rate,
+        'bits': self.size,
+        'hashes': self.hashes,
+        'nbytes': len(self.bits),
+    }
+
+
+# run the unittest with python3 -m unittest lexicon
+import copy
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+
+class TestArrayTrie(unittest.TestCase):
+
+  def test_trie(self):
+    trie = ArrayTrie()
+    for word in 'car', 'card', 'cart', 'cat':
+      trie.add(word)
+    for word in 'car', 'card', 'cart', 'cat':
+      self.assertTrue(trie.is_word(word))
+      self.assertTrue(trie.is_prefix(word))
+    for word in 'c', 'ca':
+      self.assertFalse(trie.is_word(word))
+      self.assertTrue(trie.is_prefix(word))
+    self.assertFalse(trie['NoTfOuNd'])
+
+  def test_empty_string(self):
+    trie = ArrayTrie()
+    trie.add('car')
+    trie.add('')
+    self.assertTrue(trie.is_prefix(''))
+    self.assertFalse(trie.is_word(''))
+
+  def test_siblings_are_sorted(self):
+    trie = ArrayTrie()
+    for word in 'cz', 'ca', 'cm', 'cb', 'ca':
+      trie.add(word)
+    node, letters = trie.first_child[trie['c']], []
+    while node:
+      letters.append(chr(trie.letters[node]))
+      node = trie.next_sibling[node]
+    self.assertEqual(letters, ['a', 'b', 'm', 'z'])
+    self.assertEqual(len(trie), 6)
+    self.assertFalse(trie.is_prefix('cc'))
+    self.assertTrue(trie.is_word('cz'))
+
+
+class TestDawg(unittest.TestCase):
+
+  def test_dawg(self):
+    dawg = Dawg.from_words(['car', 'card', 'cart', 'cat'])
+    for word in 'car', 'card', 'cart', 'cat':
+      self.assertTrue(dawg.is_word(word))
+      self.assertTrue(dawg.is_prefix(word))
+      self.assertEqual(dawg.info(word), (True, True))
+    for word in 'c', 'ca':
+      self.assertFalse(dawg.is_word(word))
+      self.assertTrue(dawg.is_prefix(word))
+    self.assertFalse(dawg['NoTfOuNd'])
+    self.assertEqual(dawg.info('cards'), (False, False))
+    dawg = Dawg.from_words(['', 'car'])
+    self.assertFalse(dawg.is_word(''))
+    self.assertTrue(dawg.is_prefix(''))
+
+  def test_suffixes_are_shared(self):
+    words = sorted(stem + suffix for stem in ('talk', 'walk', 'bark')
+                   for suffix in ('', 'ed', 'ing', 'er', 'ers'))
+    dawg = Dawg.from_words(words)
+    trie = ArrayTrie()
+    for word in words:
+      trie.add(word)
+    for word in words:
+      self.assertTrue(dawg.is_word(word))
+    self.assertFalse(dawg.is_word('talke'))
+    self.assertFalse(dawg.is_prefix('barkk'))
+    self.assertLess(len(dawg), len(trie) / 2)
+
+  def test_order(self):
+    dawg = Dawg()
+    dawg.add('cat')
+    dawg.add('cat')
+    with self.assertRaises(ValueError):
+      dawg.add('car')
+    dawg.finish()
+    with self.assertRaises(ValueError):
+      dawg.add('dog')
+    self.assertTrue(dawg.is_word('cat'))
+
+
+class TestMappedLexicon(unittest.TestCase):
+
+  def setUp(self):
+    self.trie = ArrayTrie()
+    for word in 'car', 'card', 'cart', 'cat', 'caf\xe9':
+      self.trie.add(word)
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, 'lexicon.trie')
+    self.trie.save(self.path)
+
+  def test_lookups(self):
+    with MappedLexicon(self.path) as lexicon:
+      for word in 'car', 'card', 'cart', 'cat', 'caf\xe9':
+        self.assertTrue(lexicon.is_word(word))
+      for word in 'c', 'ca', 'caf':
+        self.assertFalse(lexicon.is_word(word))
+        self.assertTrue(lexicon.is_prefix(word))
+      self.assertFalse(lexicon['NoTfOuNd'])
+      self.assertEqual(len(lexicon), len(self.trie))
+      with self.assertRaises(TypeError):
+        lexicon.add('cab')
+
+  def test_not_a_snapshot(self):
+    with open(self.path, 'wb') as f:
+      f.write(b'card\ncart\n')
+    with self.assertRaises(ValueError):
+      MappedLexicon(self.path)
+
+  def test_truncated(self):
+    with open(self.path, 'rb') as f:
+      snapshot = f.read()
+    for end in 3, len(snapshot) // 2, len(snapshot) - 1:
+      with open(self.path, 'wb') as f:
+        f.write(snapshot[:end])
+      with self.assertRaises(ValueError):
+        MappedLexicon(self.path)
+
+
+class TestCursor(unittest.TestCase):
+
+  def test_cursor(self):
+    trie = ArrayTrie()
+    for word in 'car', 'card', 'cart', 'cat':
+      trie.add(word)
+    dawg = Dawg.from_words(['car', 'card', 'cart', 'cat'])
+    for lexicon in trie, dawg:
+      root = lexicon.root_cursor()
+      ca = root.step('c').step('a')
+      self.assertTrue(ca.alive)
+      self.assertFalse(ca.is_word)
+      self.assertTrue(ca.step('r').is_word)
+      self.assertTrue(ca.step('r').step('d').is_word)
+      self.assertTrue(ca.step('t').is_word)
+      self.assertFalse(ca.step('t').step('s').alive)
+      self.assertFalse(ca.step('x').step('t').alive)
+      self.assertFalse(root.step('a').is_word)
+
+
+class TestCodedTrie(unittest.TestCase):
+
+  def test_alphabet(self):
+    alphabet = Alphabet.from_words(['car', 'caf\xe9'])
+    self.assertEqual(len(alphabet), 6)
+    self.assertEqual(alphabet.encode('rac\xe9'), (4, 1, 2, 5))
+    self.assertEqual(alphabet.encode('face'), (3, 1, 2, 0))
+    self.assertEqual(alphabet.decode((2, 1, 3, 5)), 'caf\xe9')
+
+  def test_trie(self):
+    trie = CodedTrie.from_words(['car', 'card', 'cart', 'cat'])
+    for word in 'car', 'card', 'cart', 'cat':
+      self.assertTrue(trie.is_word(word))
+      self.assertTrue(trie.is_prefix(word))
+    for word in 'c', 'ca', '':
+      self.assertFalse(trie.is_word(word))
+      self.assertTrue(trie.is_prefix(word))
+    for word in 'cb', 'cars', 'cab', 'x':
+      self.assertFalse(trie.is_prefix(word))
+    self.assertEqual(len(trie), 7)
+    with self.assertRaises(ValueError):
+      trie.add('cab')
+    self.assertFalse(CodedTrie.from_words(['', 'car']).is_word(''))
+
+  def test_cursor(self):
+    trie = CodedTrie.from_words(['car', 'card', 'cart', 'cat'])
+    c, a, r, t = trie.alphabet.encode('cart')
+    ca = trie.root_cursor().step(c).step(a)
+    self.assertTrue(ca.alive)
+    self.assertFalse(ca.is_word)
+    self.assertTrue(ca.step(r).is_word)
+    self.assertTrue(ca.step(r).step(t).is_word)
+    self.assertFalse(ca.step(t).step(t).alive)
+    self.assertFalse(ca.step(0).step(t).alive)
+
+
+class TestBloomLexicon(unittest.TestCase):
+
+  def test_bloom(self):
+    rng = random.Random(0)
+    words = {''.join(rng.choice('abcdef') for _ in range(8))
+             for _ in range(1000)}
+    trie = ArrayTrie()
+    for word in words:
+      trie.add(word)
+    bloom = BloomLexicon(trie, words, error_rate=0.01)
+    for word in words:
+      self.assertTrue(bloom.is_word(word))
+    self.assertFalse(bloom.is_word(min(words)[:4]))
+    self.assertTrue(bloom.is_prefix(min(words)[:4]))
+
+    misses = {''.join(rng.choice('abcdef') for _ in range(8))
+              for _ in range(2000)} - words
+    for word in misses:
+      self.assertFalse(bloom.is_word(word))
+    stats = bloom.stats()
+    self.assertEqual(stats['lookups'], len(words) + len(misses) + 1)
+    self.assertEqual(stats['rejected'] + stats['false_positives'],
+                     len(misses) + 1)
+    self.assertLess(stats['false_positive_rate'], 0.03)
+    self.assertEqual(stats['nbytes'], len(bloom.bits))
+
+  def test_add(self):
+    bloom = BloomLexicon(ArrayTrie(), [])
+    self.assertFalse(bloom.is_word('car'))
+    bloom.add('car')
+    self.assertTrue(bloom.is_word('car'))
+    self.assertEqual(bloom.stats()['rejected'], 1)
+
+  def test_pickle(self):
+    words = ['car', 'card', 'cart', 'cat']
+    trie = ArrayTrie()
+    for word in words:
+      trie.add(word)
+    bloom = BloomLexicon(trie, words)
+    for copied in copy.copy(bloom), pickle.loads(pickle.dumps(bloom)):
+      self.assertEqual(copied.bits, bloom.bits)
+      self.assertTrue(all(copied.is_word(word) for word in words))
+      self.assertTrue(copied.is_prefix('ca'))
+
+  def test_stable_hash(self):
+    # The bits must not depend on the hash seed of the process.
+    script = ('import lexicon; print(list(lexicon.BloomLexicon('
+              'lexicon.ArrayTrie(), ["car", "cat"]).bits))')
+    outputs = set()
+    for seed in '1', '2':
+      outputs.add(subprocess.run(
+          [sys.executable, '-c', script], check=True, capture_output=True,
+          cwd=os.path.dirname(os.path.abspath(__file__)),
+          env=dict(os.environ, PYTHONHASHSEED=seed)).stdout)
+    self.assertEqual(len(outputs), 1)
+
+
+def _count_words(payload, words):
+  """Unpickles a lexicon and counts the words in it, in a pool worker.
+
+  Returns the count and the peak of the memory allocated meanwhile."""
+  tracemalloc.start()
+  lexicon = pickle.loads(payload)
+  count = sum(lexicon.is_word(word) for word in words)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  lexicon.close()
+  return count, peak
+
+
+class TestSharedLexicon(unittest.TestCase):
+
+  def test_workers_share_the_lexicon(self):
+    rng = random.Random(0)
+    words = {''.join(rng.choice('abcdefghijklmnop') for _ in range(12))
+             for _ in range(20000)}
+    trie = ArrayTrie()
+    for word in words:
+      trie.add(word)
+    queries = sorted(words)[:1000] + ['q' * 12] * 1000
+
+    lexicon = SharedLexicon.create(trie)
+    try:
+      payload = pickle.dumps(lexicon)
+      self.assertLess(len(payload), 200)
+      with multiprocessing.Pool(4) as pool:
+        results = pool.starmap(_count_words, [(payload, queries)] * 4)
+      for count, peak in results:
+        self.assertEqual(count, 1000)
+        # a copy of the lexicon would allocate its whole size.
+        self.assertLess(peak, trie.nbytes() / 20)
+      self.assertTrue(lexicon.is_word(queries[0]))
+      self.assertFalse(lexicon.is_prefix('q'))
+    finally:
+      lexicon.close()
+
+
+class TestBuildSharded(unittest.TestCase):
+
+  def test_build_sharded(self):
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefgh\xe9')
+                     for _ in range(rng.randint(1, 6))) for _ in range(2000)]
+    trie = ArrayTrie()
+    for word in words:
+      trie.add(word)
+
+    for workers in 1, 3, 20:
+      sharded = build_sharded(iter(words), workers)
+      self.assertEqual(len(sharded), len(trie))
+      for word in words:
+        self.assertTrue(sharded.is_word(word))
+      for string in 'ab', 'abcdefg', 'x', 'hhhhhhh':
+        self.assertEqual(sharded.is_word(string), trie.is_word(string))
+        self.assertEqual(sharded.is_prefix(string), trie.is_prefix(string))
+
+      node, letters = sharded.first_child[0], []
+      while node:
+        letters.append(chr(sharded.letters[node]))
+        node = sharded.next_sibling[node]
+      self.assertEqual(letters, sorted(set(word[0] for word in words)))
+
+  def test_stitch_nothing(self):
+    self.assertEqual(len(stitch([ArrayTrie().to_bytes()])), 1)
@@ -0,0 +1,214 @@
+"""Benchmarks the lexicon implementations of the repository.
+
+Each lexicon is loaded with the words of the dictionary, and measured for:
+- its build time, and the peak of the memory allocated meanwhile (tracemalloc),
+- the latency percentiles of is_word() and is_prefix(), on hits and misses.
+
+The results are printed as JSON, to track the regressions between versions:
+$ python3 lexicon_bench.py > before.json
+$ python3 lexicon_bench.py --dictionary /path/to/words --queries 100 \\
+    --only jdb/Trie jdb/ArrayTrie
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from bisect import bisect_left
+
+import boggle
+import lexicon
+import trie
+import trie_class
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _module(path):
+  """Imports a module of the repository from its path, relative to ROOT.
+
+  Several authors name their modules alike (boggle.py...), so the module is
+  imported under a name made of its path."""
+  name = path.replace('/', '_').replace('.py', '')
+  spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+def _added(lexicon_class):
+  """Returns a builder adding the words one by one to a lexicon_class()."""
+  def build(words):
+    instance = lexicon_class()
+    for word in words:
+      instance.add(word)
+    return instance.is_word, instance.is_prefix
+  return build
+
+
+def _functions(module):
+  """Returns a builder for the functional API of the trie exercise."""
+  def build(words):
+    data = module.init_trie(words)
+    return (lambda s: module.is_word(data, s),
+            lambda s: module.is_prefix(data, s))
+  return build
+
+
+def _added_all(backend):
+  """Returns a builder passing all the words to backend()."""
+  return lambda words: _methods(backend(words))
+
+
+def _methods(instance):
+  return instance.is_word, instance.is_prefix
+
+
+def _snapshot(words):
+  """Builds a MappedLexicon: the time includes saving the snapshot."""
+  trie = lexicon.ArrayTrie()
+  for word in words:
+    trie.add(word)
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'lexicon.trie')
+    trie.save(path)
+    del trie
+    # the mapping outlives the removal of the file.
+    return _methods(lexicon.MappedLexicon(path))
+
+
+def _bloom(words):
+  """Builds a Trie behind a BloomLexicon."""
+  trie = boggle.Trie()
+  for word in words:
+    trie.add(word)
+  return _methods(lexicon.BloomLexicon(trie, words))
+
+
+def builders():
+  """Returns the lexicon implementations, by name.
+
+  A builder takes the list of words and returns is_word and is_prefix."""
+  joeyart_trie = _module('joeyart/trie.py')
+  exercices_trie_class = _module('exercices/trie_class.py')
+  return {
+      'joeyart/trie.py': _functions(joeyart_trie),
+      'exercices/trie_class.py': lambda words: (
+          lambda s: exercices_trie_class.is_word(words, s),
+          lambda s: exercices_trie_class.is_prefix(words, s)),
+      'jdb/Trie': _added(boggle.Trie),
+      'ptbrowne/Lexicon': _added(_module('ptbrowne/boggle.py').Lexicon),
+      'exercices/Lexicon': _added(_module('exercices/boggle.py').Lexicon),
+      'jdb/trie.py': _functions(trie),
+      'jdb/SortedWords': _added_all(trie_class.SortedWords),
+      'jdb/PackedWords': _added_all(trie_class.PackedWords),
+      'jdb/ArrayTrie': _added(lexicon.ArrayTrie),
+      'jdb/MappedLexicon': _snapshot,
+      'jdb/Dawg': lambda words: _methods(lexicon.Dawg.from_words(sorted(words))),
+      'jdb/CodedTrie': _added_all(lexicon.CodedTrie.from_words),
+      'jdb/BloomLexicon': _bloom,
+  }
+
+
+def queries(words, count, seed=0):
+  """Returns 4 lists of queries: word hits, word misses, prefix hits, prefix
+  misses. Misses are made from the letters of the words, to be realistic."""
+  rng, sorted_words, known = random.Random(seed), sorted(words), set(words)
+
+  def is_prefix(string):
+    i = bisect_left(sorted_words, string)
+    return i < len(sorted_words) and sorted_words[i].startswith(string)
+
+  word_hits = [rng.choice(words) for _ in range(count)]
+  prefix_hits = [w[:rng.randint(1, len(w))] for w in word_hits]
+  word_misses, prefix_misses = [], []
+  while len(word_misses) < count or len(prefix_misses) < count:
+    word = rng.choice(words)
+    shuffled = ''.join(rng.sample(word, len(word)))
+    if shuffled not in known and len(word_misses) < count:
+      word_misses.append(shuffled)
+    if not is_prefix(shuffled) and len(prefix_misses) < count:
+      prefix_misses.append(shuffled)
+  return word_hits, word_misses, prefix_hits, prefix_misses
+
+
+def percentiles(lookup, strings):
+  """Returns the 50th, 90th and 99th percentiles of the latency of lookup,
+  in microseconds."""
+  clock, latencies = time.perf_counter_ns, []
+  for string in strings:
+    start = clock()
+    lookup(string)
+    latencies.append((clock() - start) / 1000)
+  p = statistics.quantiles(latencies, n=100)
+  return {'p50': p[49], 'p90': p[89], 'p99': p[98]}
+
+
+def measure(build, words, word_hits, word_misses, prefix_hits, prefix_misses):
+  """Returns the measures of one lexicon implementation, as a dict."""
+  tracemalloc.start()
+  start = time.perf_counter()
+  try:
+    is_word, is_prefix = build(words)
+  except Exception as e:
+    return {'error': '%s: %s' % (type(e).__name__, e)}
+  finally:
+    build_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+  return {
+      'build_seconds': build_seconds,
+      'peak_bytes': peak,
+      'latency_us': {
+          'is_word_hit': percentiles(is_word, word_hits),
+          'is_word_miss': percentiles(is_word, word_misses),
+          'is_prefix_hit': percentiles(is_prefix, prefix_hits),
+          'is_prefix_miss': percentiles(is_prefix, prefix_misses),
+      }
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--dictionary', default=boggle.DICTIONARY)
+  parser.add_argument('--queries', type=int, default=1000,
+                      help='number of queries of each kind')
+  parser.add_argument('--only', nargs='+', help='names of the lexicons')
+  parser.add_argument('--output', help='JSON file, instead of stdout')
+  args = parser.parse_args(argv)
+
+  words = list(dict.fromkeys(boggle.dictionary_words(args.dictionary)))
+  lists = queries(words, args.queries)
+  results = {}
+  for name, build in builders().items():
+    if args.only and name not in args.only:
+      continue
+    print('measuring %s...' % name, file=sys.stderr)
+    results[name] = measure(build, words, *lists)
+
+  report = {
+      'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'dictionary': args.dictionary,
+      'words': len(words),
+      'queries': args.queries,
+      'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+  main()
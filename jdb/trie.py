@@ -0,0 +1,160 @@
+"""Let's build a 'Trie' datastructure.
+
+When you know a list of words, there are two frequent questions:
+- is this arbitratry string a prefix of a known word?
+- is this arbitrary string a full known word?
+
+When you have a Trie datastructure, you can use 2 functions or methods:
+- is_prefix(string) -> a boolean
+- is_word(string) -> a boolean.
+
+The batch variants, is_prefix_many() and is_word_many(), answer many strings
+in one walk of the Trie.
+"""
+
+from typing import Iterable, List, Optional
+
+# A trie node is a dict of letter to child node. The key END marks the nodes
+# ending a full word: no letter is the empty string.
+END = ''
+
+
+def init_trie(words: Iterable[str]) -> dict:
+  """Returns a Trie datastructure."""
+  trie = {}
+  for word in words:
+    node = trie
+    for letter in word:
+      node = node.setdefault(letter, {})
+    node[END] = True
+  return trie
+
+
+def _node(trie: dict, string: str) -> Optional[dict]:
+  """Returns the node of the trie reached by string, None if not found."""
+  node = trie
+  for letter in string:
+    node = node.get(letter)
+    if node is None:
+      return None
+  return node
+
+
+def is_prefix(trie: dict, string: str) -> bool:
+  """Returns True if the string is a prefix for one or more words."""
+  return _node(trie, string) is not None
+
+
+def is_word(trie: dict, string: str) -> bool:
+  """Returns True if the string is a full correct word."""
+  node = _node(trie, string)
+  return node is not None and END in node
+
+
+def _nodes_many(trie: dict, strings: List[str]) -> List[Optional[dict]]:
+  """Returns the node reached by each string, None if not found.
+
+  Each distinct string is walked once, in sorted order, so that two
+  consecutive strings share their longest common prefix: the walk of a string
+  starts from the node of this common prefix, not from the root. The nodes are
+  returned in the order of the input strings."""
+  nodes = dict.fromkeys(strings)
+  # path[i] is the node of previous[:i], up to the first letter not found.
+  path, previous = [trie], ''
+  for string in sorted(nodes):
+    matched = len(path) - 1
+    if string.startswith(previous[:matched]):
+      common = matched  # the usual case, compared at C speed.
+    else:
+      common = 0
+      while string[common] == previous[common]:
+        common += 1
+      del path[common + 1:]
+
+    node = path[-1]
+    for letter in string[common:]:
+      node = node.get(letter)
+      if node is None:
+        break
+      path.append(node)
+    nodes[string], previous = node, string
+  return [nodes[string] for string in strings]
+
+
+def is_prefix_many(trie: dict, strings: Iterable[str]) -> List[bool]:
+  """Returns is_prefix(trie, string) for each string, in the input order."""
+  return [node is not None for node in _nodes_many(trie, list(strings))]
+
+
+def is_word_many(trie: dict, strings: Iterable[str]) -> List[bool]:
+  """Returns is_word(trie, string) for each string, in the input order."""
+  return [node is not None and END in node
+          for node in _nodes_many(trie, list(strings))]
+
+
+def benchmark(words: List[str], queries: List[str]):
+  """Prints the time to check the queries one by one, then in one batch."""
+  import time
+  trie = init_trie(words)
+  for scalar, many in (is_word, is_word_many), (is_prefix, is_prefix_many):
+    start = time.perf_counter()
+    expected = [scalar(trie, query) for query in queries]
+    middle = time.perf_counter()
+    batch = many(trie, queries)
+    end = time.perf_counter()
+    assert expected == batch
+    print('%-10s %8.3fs, %-15s %8.3fs: x%.2f' % (
+        scalar.__name__, middle - start, many.__name__, end - middle,
+        (middle - start) / (end - middle)))
+
+
+# To run all the tests:
+# $ python3 -m unittest trie
+#
+# To run the benchmark on the system dictionary:
+# $ python3 trie.py
+
+import unittest
+
+
+class TrieTest(unittest.TestCase):
+
+  def test_init(self):
+    self.assertIsNotNone(init_trie(['car', 'cat', 'python']))
+
+  def test_is_prefix(self):
+    trie = init_trie(['car', 'cat', 'python'])
+
+    self.assertTrue(is_prefix(trie, 'ca'))
+    self.assertTrue(is_prefix(trie, 'car'))
+    self.assertTrue(is_prefix(trie, 'cat'))
+
+    self.assertFalse(is_prefix(trie, 'zebr'))
+
+  def test_is_word(self):
+    trie = init_trie(['car', 'cat', 'python'])
+    self.assertTrue(is_word(trie, 'car'))
+    self.assertTrue(is_word(trie, 'cat'))
+    self.assertTrue(is_word(trie, 'python'))
+
+    self.assertFalse(is_word(trie, 'zebra'))
+    self.assertFalse(is_word(trie, 'ca'))
+
+  def test_many(self):
+    trie = init_trie(['car', 'card', 'cat', 'python'])
+    queries = ['cat', 'zebra', 'ca', 'card', '', 'cards', 'car', 'py', 'cb',
+               'car', 'python', 'c']
+    self.assertEqual(is_word_many(trie, queries),
+                     [is_word(trie, q) for q in queries])
+    self.assertEqual(is_prefix_many(trie, iter(queries)),
+                     [is_prefix(trie, q) for q in queries])
+    self.assertEqual(is_word_many(trie, []), [])
+
+
+if __name__ == '__main__':
+  import random
+  from boggle import dictionary_words
+  words = list(dictionary_words())
+  rng = random.Random(0)
+  queries = [rng.choice(words)[:rng.randint(1, 12)] for _ in range(10**6)]
+  benchmark(words, queries)
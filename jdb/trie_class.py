@@ -0,0 +1,156 @@
+"""Let's refactor this code to make it into a class so the unit test pass.
+
+The Trie class delegates to a backend, which is picked by name per
+deployment, depending on the memory/latency trade-off:
+- 'sorted': the words in a sorted list, searched by bisection, O(log n),
+- 'packed': the same, in one bytes blob with an array of offsets,
+- 'dicts', 'trie', 'array', 'dawg', 'coded': the tries of trie.py, boggle.py and
+  lexicon.py, O(k) for a string of k letters.
+
+A backend is a callable which takes the words and returns an object with the
+is_prefix() and is_word() methods.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+import boggle
+import lexicon
+import trie
+
+
+class SortedWords:
+  """The words in a sorted list: O(log n) lookups, no per-word overhead."""
+
+  def __init__(self, words: Iterable[str]):
+    self.words = sorted(set(words))
+
+  def is_prefix(self, string: str) -> bool:
+    i = bisect_left(self.words, string)
+    return i < len(self.words) and self.words[i].startswith(string)
+
+  def is_word(self, string: str) -> bool:
+    i = bisect_left(self.words, string)
+    return i < len(self.words) and self.words[i] == string
+
+
+class PackedWords:
+  """The sorted words, encoded in utf-8 in one bytes blob.
+
+  offsets[i] is the start of the word number i in the blob, offsets[-1] is
+  the size of the blob. The blob is a sequence of bytes words for bisect:
+  the utf-8 encoding keeps the order of the code points."""
+
+  def __init__(self, words: Iterable[str]):
+    encoded = sorted({word.encode() for word in words})
+    self.blob, self.offsets = b''.join(encoded), array('I', [0])
+    for word in encoded:
+      self.offsets.append(self.offsets[-1] + len(word))
+
+  def __len__(self):
+    return len(self.offsets) - 1
+
+  def __getitem__(self, i):
+    return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+  def is_prefix(self, string: str) -> bool:
+    string = string.encode()
+    i = bisect_left(self, string)
+    return i < len(self) and self[i].startswith(string)
+
+  def is_word(self, string: str) -> bool:
+    string = string.encode()
+    i = bisect_left(self, string)
+    return i < len(self) and self[i] == string
+
+
+class NestedDicts:
+  """The trie of trie.py, as a backend."""
+
+  def __init__(self, words: Iterable[str]):
+    self.trie = trie.init_trie(words)
+
+  def is_prefix(self, string: str) -> bool:
+    return trie.is_prefix(self.trie, string)
+
+  def is_word(self, string: str) -> bool:
+    return trie.is_word(self.trie, string)
+
+
+def added(lexicon_class):
+  """Returns a backend adding the words one by one to a lexicon_class()."""
+  def backend(words):
+    lexicon = lexicon_class()
+    for word in words:
+      lexicon.add(word)
+    return lexicon
+  return backend
+
+
+BACKENDS = {
+    'sorted': SortedWords,
+    'packed': PackedWords,
+    'dicts': NestedDicts,
+    'trie': added(boggle.Trie),
+    'array': added(lexicon.ArrayTrie),
+    'dawg': lambda words: lexicon.Dawg.from_words(sorted(set(words))),
+    'coded': lexicon.CodedTrie.from_words,
+}
+
+
+class Trie:
+  """Answers is_prefix() and is_word() with one of the BACKENDS."""
+
+  def __init__(self, words: Iterable[str], backend='sorted'):
+    if isinstance(backend, str):
+      backend = BACKENDS[backend]
+    self.backend = backend(words)
+
+  def is_prefix(self, string: str) -> bool:
+    """Returns True if the string is a prefix for one or more words."""
+    return self.backend.is_prefix(string)
+
+  def is_word(self, string: str) -> bool:
+    """Returns True if the string is a full correct word."""
+    return self.backend.is_word(string)
+
+
+# To run all the tests:
+# $ python3 -m unittest trie_class
+
+import unittest
+
+
+class TrieTest(unittest.TestCase):
+
+  def test_is_prefix(self):
+    for backend in BACKENDS:
+      trie = Trie(['car', 'cat', 'python'], backend)
+
+      self.assertTrue(trie.is_prefix('ca'), backend)
+      self.assertTrue(trie.is_prefix('car'), backend)
+      self.assertTrue(trie.is_prefix('cat'), backend)
+
+      self.assertFalse(trie.is_prefix('zebr'), backend)
+      self.assertFalse(trie.is_prefix('cb'), backend)
+
+  def test_is_word(self):
+    for backend in BACKENDS:
+      trie = Trie(['car', 'cat', 'python'], backend)
+
+      self.assertTrue(trie.is_word('car'), backend)
+      self.assertTrue(trie.is_word('cat'), backend)
+      self.assertTrue(trie.is_word('python'), backend)
+
+      self.assertFalse(trie.is_word('zebra'), backend)
+      self.assertFalse(trie.is_word('ca'), backend)
+
+  def test_packed_words(self):
+    trie = Trie(['caf\xe9', 'cafe', 'cafes', 'cafe'], PackedWords)
+    self.assertEqual(len(trie.backend), 3)
+    self.assertTrue(trie.is_word('caf\xe9'))
+    self.assertTrue(trie.is_prefix('caf\xe9'))
+    self.assertFalse(trie.is_word('caf'))
+    self.assertTrue(trie.is_prefix('cafes'))
+    self.assertFalse(trie.is_prefix('cafess'))
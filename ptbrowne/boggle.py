@@ -10,13 +10,43 @@
 # - is_word(string): Returns whether the given string is a valid word.
 # - is_prefix(string): Returns whether the given string is a prefix of
 #   at least one word in the dictionary.
+import heapq
 import json
+from bisect import insort
 from collections import defaultdict, OrderedDict
 from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
 
 DX = [-1, 0, 1]
 DY = [-1, 0, 1]
 
+
+@lru_cache(maxsize=None)
+def adjacency(nrows, ncols, connectivity=8):
+  """
+  Returns the neighbors of the cells of a nrows x ncols grid, computed once
+  per shape and shared by all its grids.
+
+  The cell (i, j) is number i * ncols + j, and its neighbors are
+  neighbors[offsets[cell]:offsets[cell + 1]], in 2 flat tuples. With a
+  connectivity of 4, the diagonal cells are not neighbors.
+  """
+  if connectivity not in (4, 8):
+    raise ValueError('connectivity must be 4 or 8')
+  offsets, neighbors = [0], []
+  for i in range(nrows):
+    for j in range(ncols):
+      for dx in DX:
+        for dy in DY:
+          if dx == 0 and dy == 0 or connectivity == 4 and dx and dy:
+            continue
+          ni, nj = (i + dx), (j + dy)
+          if ni >= 0 and ni < nrows and nj >= 0 and nj < ncols:
+            neighbors.append(ni * ncols + nj)
+      offsets.append(len(neighbors))
+  return tuple(offsets), tuple(neighbors)
+
 @contextmanager
 def mark_seen(seen, pos, val):
   seen[pos] = val
@@ -48,56 +78,88 @@ class Grid:
     self.data = [list(line) for line in lines]
     self.nrows = len(self.data)
     self.ncols = len(self.data[0])
+    self.offsets, self.adjacent = adjacency(
+      self.nrows, self.ncols, kwargs.get('connectivity', 8))
+    self.positions = [(i, j) for i in range(self.nrows)
+                      for j in range(self.ncols)]
+    # a CodedLexicon steps with the codes of the letters: encoded once, here
+    encode = getattr(self.lexicon, 'encode', None)
+    self.codes = [encode(line) for line in self.data] if encode else self.data
 
   def neighbors(self, pos):
     """Returns all the valid neighbord of a cell at pos"""
-    i, j = pos
-    nrows, ncols = self.nrows, self.ncols
-    for dx in DX:
-      for dy in DY:
-        if dx == 0 and dy == 0:
-          continue
-        ni, nj = (i + dx), (j + dy)
-        if ni >= 0 and ni < nrows and nj >= 0 and nj < ncols:
-          yield ni, nj
+    cell = pos[0] * self.ncols + pos[1]
+    positions = self.positions
+    for neighbor in self.adjacent[self.offsets[cell]:self.offsets[cell + 1]]:
+      yield positions[neighbor]
 
   def value_at(self, pos):
     i, j = pos
     return self.data[i][j]
 
-  def _walk(self, pos, seen=None):
-    """Yields all the words that can be formed from a position in the grid"""
+  def _walk(self, pos, seen=None, overlay=None):
+    """Yields all the words that can be formed from a position in the grid
+
+    With an overlay, a (left, consumed) pair shared by all the walks of a
+    solve, each word is only yielded once: consumed holds the ids of the
+    nodes of the words found, and left the number of words not found yet
+    below a node, by id, when it differs from node.count. A subtree with no
+    word left is not walked again.
+    """
 
     if not seen:
       seen = OrderedDict()
 
+    root = self.lexicon.root_cursor()
     neighbors = lambda pos: (
       pos for pos in self.neighbors(pos) if not seen.get(pos)
     )
     def get_context(pos):
+      # seen values are (letter, cursor) pairs: extending the word costs a
+      # single cursor step, and the word is only joined when it is yielded.
       letter = self.value_at(pos)
-      word = ''.join(seen.values()) + letter
-      is_prefix, is_word = self.lexicon.info(word)
+      parent = next(reversed(seen.values()))[1] if seen else root
+      cursor = parent.step(self.codes[pos[0]][pos[1]])
+      ok = cursor.is_word
+      if overlay and cursor.alive:
+        left, consumed = overlay
+        node = cursor.node
+        if not left.get(id(node), node.count):
+          cursor, ok = DEAD_CURSOR, False
+        elif ok and id(node) in consumed:
+          ok = False
+        elif ok:
+          consumed.add(id(node))
+          path = [root.node] + [c.node for _, c in seen.values()] + [node]
+          for node in path:
+            left[id(node)] = left.get(id(node), node.count) - 1
       return {
-        'ok': is_word,
-        'yield': word,
-        'stop': not is_prefix,
-        'mark': letter
+        'ok': ok,
+        'yield': ok and (''.join(l for l, _ in seen.values()) + letter),
+        'stop': not cursor.alive,
+        'mark': (letter, cursor)
       }
     mark = lambda pos, ctx: mark_seen(seen, pos, ctx['letter'])
 
     yield from walk(pos, seen, neighbors, get_context)
 
-  def words_iter(self):
-    """Yields all the words that can be formed in the grid"""
+  def words_iter(self, unique=False):
+    """
+    Yields all the words that can be formed in the grid
+
+    A word is yielded for each of its paths, or only once if unique: the
+    words found are then consumed from a per-solve overlay on the lexicon,
+    whose nodes must count the words below them (node.count).
+    """
     starts = [(i, j) for i in range(self.nrows) for j in range(self.ncols)]
+    overlay = ({}, set()) if unique else None
 
     for start in starts:
-      yield from self._walk(start)
+      yield from self._walk(start, overlay=overlay)
 
-  def words(self):
+  def words(self, unique=False):
     """Returns all the words that can be formed in the grid as a list"""
-    return list(self.words_iter())
+    return list(self.words_iter(unique))
 
 class Lexicon:
   """
@@ -116,21 +178,148 @@ class Lexicon:
 
   Each node of the trie also has the information of whether the current
   path is a word.
+
+  Words can have a weight, for autocompletion: each node caches its top_size
+  best (-weight, word) entries, sorted, so complete(prefix, k) costs
+  O(len(prefix) + k) and never walks the subtree when k <= top_size.
+
+  Words can be removed: the branches left without words are pruned, and the
+  root counts the removals to compact() the dicts every compact_every times.
+
+  Each node counts the words of its subtree (count), for the Grid searches
+  which consume the words found.
   """
+  top_size = 10
+  removed, compact_every = 0, 10000
+
   def __init__(self):
     self.word = False
-    self.trie = defaultdict(lambda: Lexicon())
-
-  def add(self, word):
-    """Add a word to the lexicon trie"""
-    _len = len(word)
-    trie = self.trie
-    for i, letter in enumerate(word):
-      node = trie[letter]
-      is_last_letter = i == _len - 1
-      if not node.word and is_last_letter:
-        node.word = True
-      trie = node.trie
+    self.weight = 0
+    self.count = 0
+    self.top = []
+    self.trie = defaultdict(type(self))
+
+  def add(self, word, weight=0):
+    """Add a word to the lexicon trie, or update its weight"""
+    if not word:
+      return
+    path = [self]
+    for letter in word:
+      path.append(path[-1].trie[letter])
+    leaf = path[-1]
+    old_weight = leaf.weight if leaf.word else None
+    leaf.word, leaf.weight = True, weight
+    if old_weight is None:
+      for node in path:
+        node.count += 1
+
+    if old_weight is None or weight >= old_weight:
+      old_entry = None if old_weight is None else (-old_weight, word)
+      for node in path:
+        node._insert_top((-weight, word), old_entry)
+    else:
+      # a lower weight can let another word of the subtree in the top: the
+      # top entries are recomputed from the children's, bottom-up.
+      for depth in reversed(range(len(path))):
+        path[depth]._update_top(word[:depth])
+
+  def _insert_top(self, entry, old_entry=None):
+    """Inserts entry in the top entries, replacing old_entry if present"""
+    top = self.top
+    if old_entry in top:
+      top.remove(old_entry)
+    if len(top) < self.top_size or entry < top[-1]:
+      insort(top, entry)
+      del top[self.top_size:]
+
+  def _update_top(self, prefix):
+    """Recomputes the top entries from the children's, prefix is the node's"""
+    own = [(-self.weight, prefix)] if self.word else []
+    children = (child.top for child in self.trie.values())
+    self.top = heapq.nsmallest(self.top_size, chain(own, *children))
+
+  def remove(self, word):
+    """Removes a word from the lexicon, returns False if it was not there"""
+    path = [self]
+    for letter in word:
+      if letter not in path[-1].trie:
+        return False
+      path.append(path[-1].trie[letter])
+    if not word or not path[-1].word:
+      return False
+
+    path[-1].word, path[-1].weight = False, 0
+    for node in path:
+      node.count -= 1
+    for depth in reversed(range(len(path))):
+      node = path[depth]
+      if depth and not node.word and not node.trie:
+        del path[depth - 1].trie[word[depth - 1]]  # an empty branch
+      else:
+        node._update_top(word[:depth])
+
+    self.removed += 1
+    if self.removed >= self.compact_every:
+      self.compact()
+    return True
+
+  def compact(self):
+    """Rebuilds the dicts of the trie: dicts never shrink on deletions"""
+    stack = [self]
+    while stack:
+      node = stack.pop()
+      node.trie = defaultdict(type(node), node.trie)
+      node.top = list(node.top)
+      stack.extend(node.trie.values())
+    self.removed = 0
+
+  def complete(self, prefix, k=10):
+    """
+    Returns the k words of highest weight starting with prefix.
+
+    Words of equal weight are sorted alphabetically.
+    """
+    node = self.get_node(prefix)
+    if node is None:
+      return []
+    if k <= self.top_size:
+      return [word for _, word in node.top[:k]]
+    return [word for _, word in heapq.nsmallest(k, node._entries(prefix))]
+
+  def _entries(self, prefix):
+    """Yields the (-weight, word) entries of the subtree, prefix is the node's"""
+    stack = [(self, prefix)]
+    while stack:
+      node, word = stack.pop()
+      if node.word:
+        yield -node.weight, word
+      stack.extend((child, word + letter)
+                   for letter, child in node.trie.items())
+
+  def fuzzy(self, word, max_distance):
+    """
+    Returns the (word, distance) of the words of the lexicon at most
+    max_distance Levenshtein edits away from word, closest first.
+
+    Each node gets one row of the edit distance table, computed from its
+    parent's row in O(len(word)). A branch is pruned as soon as the minimum
+    of its row is over max_distance: the distance can only grow below.
+    """
+    found = []
+    stack = [(self, '', list(range(len(word) + 1)))]
+    while stack:
+      node, prefix, row = stack.pop()
+      if node.word and row[-1] <= max_distance:
+        found.append((prefix, row[-1]))
+      if min(row) > max_distance:
+        continue
+      for letter, child in node.trie.items():
+        child_row = [row[0] + 1]
+        for i, expected in enumerate(word, 1):
+          child_row.append(min(child_row[i - 1] + 1, row[i] + 1,
+                               row[i - 1] + (letter != expected)))
+        stack.append((child, prefix + letter, child_row))
+    return sorted(found, key=lambda pair: (pair[1], pair[0]))
 
   def get_node(self, string):
     """
@@ -164,13 +353,189 @@ class Lexicon:
   def info(self, word):
     """is_prefix and is_word in one traversal"""
     leaf = self.get_node(word)
-    return bool(leaf), leaf and leaf.is_word
+    return bool(leaf), bool(leaf and leaf.word)
+
+  def root_cursor(self):
+    """Returns a Cursor on the root of the trie"""
+    return Cursor(self)
 
   def __repr__(self):
-    return json.dumps(self, indent=2)
+    return '<%s word=%r weight=%r children=%r>' % (
+      type(self).__name__, self.word, self.weight, ''.join(self.trie))
+
+  def dump(self, f):
+    """
+    Writes the lexicon to the text file f, one line per node, in preorder.
+
+    A line is the letter of the node, then its number of children, then
+    '*' and the JSON weight if the node ends a word. The root has no letter.
+    The trie is walked with a stack of iterators, never recursively.
+    """
+    def line(node):
+      weight = '*' + json.dumps(node.weight) if node.word else ''
+      return '%d%s\n' % (len(node.trie), weight)
+
+    f.write(line(self))
+    stack = [iter(self.trie.items())]
+    while stack:
+      for letter, node in stack[-1]:
+        f.write(letter + line(node))
+        stack.append(iter(node.trie.items()))
+        break
+      else:
+        stack.pop()
+
+  @classmethod
+  def load(cls, f):
+    """
+    Returns the lexicon written by dump() to the text file f.
+
+    The lines are read one at a time: memory is the lexicon, plus a stack as
+    deep as the longest word. The top entries of a node are computed from
+    its children's once they are all read.
+    """
+    def read(node, line):
+      children, _, weight = line.rstrip('\n').partition('*')
+      if weight:
+        node.word, node.weight = True, json.loads(weight)
+      return int(children)
+
+    lines = iter(f)
+    root = cls()
+    # the nodes whose children are being read, with the number left to read
+    stack, prefix = [[root, read(root, next(lines))]], []
+    while stack:
+      node, left = frame = stack[-1]
+      if not left:
+        node._update_top(''.join(prefix))
+        node.count += node.word
+        stack.pop()
+        del prefix[-1:]
+        if stack:
+          stack[-1][0].count += node.count
+        continue
+      frame[1] -= 1
+      line = next(lines)
+      child = node.trie[line[0]]
+      stack.append([child, read(child, line[1:])])
+      prefix.append(line[0])
+    return root
+
+
+class Cursor:
+  """
+  Cursor is a position in the lexicon trie.
+
+  step(letter) moves to the child node in O(1), so a word built one letter
+  at a time never walks down from the root again.
+  """
+  __slots__ = ('node',)
+
+  def __init__(self, node):
+    self.node = node
+
+  def step(self, letter):
+    """Returns the cursor moved to the child node of letter"""
+    node = self.node
+    if node is None or letter not in node.trie:
+      return DEAD_CURSOR
+    return Cursor(node.trie[letter])
+
+  @property
+  def alive(self):
+    """True if the letters read so far prefix a word of the lexicon"""
+    return self.node is not None
+
+  @property
+  def is_word(self):
+    """True if the letters read so far are a word of the lexicon"""
+    return self.node is not None and self.node.word
+
+DEAD_CURSOR = Cursor(None)
+
+
+class CodedNode:
+  __slots__ = ('word', 'count', 'table')
+
+  def __init__(self, word, count, width):
+    self.word = word
+    self.count = count
+    self.table = [None] * width
+
+
+class CodedLexicon:
+  """
+  CodedLexicon is a read-only copy of a Lexicon, whose letters are encoded
+  once as small integers: 1 to n for its n letters, 0 for any other letter.
+
+  Each node is a fixed-width table: node.table[code] is the child node of
+  the letter of this code, None if none. A cursor step indexes a list,
+  instead of hashing a one-letter string.
+  """
+  def __init__(self, lexicon):
+    letters = set()
+    stack = [lexicon]
+    while stack:
+      node = stack.pop()
+      letters.update(node.trie)
+      stack.extend(node.trie.values())
+    self.letters = [''] + sorted(letters)
+    self.alphabet = {letter: code for code, letter in enumerate(self.letters)}
+    del self.alphabet['']
+
+    width = len(self.letters)
+    self.root = CodedNode(lexicon.word, lexicon.count, width)
+    stack = [(lexicon, self.root)]
+    while stack:
+      node, coded = stack.pop()
+      for letter, child in node.trie.items():
+        coded_child = coded.table[self.alphabet[letter]] = CodedNode(
+          child.word, child.count, width)
+        stack.append((child, coded_child))
+
+  def encode(self, string):
+    """Returns the codes of the letters of string"""
+    alphabet = self.alphabet
+    return [alphabet.get(letter, 0) for letter in string]
+
+  def get_node(self, string):
+    """Returns the node of the string (prefix or word), None if not found"""
+    node = self.root
+    for code in self.encode(string):
+      node = node.table[code]
+      if node is None:
+        return None
+    return node
+
+  def is_prefix(self, prefix):
+    """Returns True if prefix prefixes any of the words in the lexicon"""
+    return self.get_node(prefix) is not None
+
+  def is_word(self, word):
+    """Returns True if the word is found in the lexicon"""
+    leaf = self.get_node(word)
+    return leaf is not None and leaf.word
+
+  def root_cursor(self):
+    """Returns a CodedCursor on the root of the trie"""
+    return CodedCursor(self.root)
+
+
+class CodedCursor(Cursor):
+  """
+  CodedCursor is a position in a CodedLexicon, it steps with letter codes.
+  """
+  __slots__ = ()
+
+  def step(self, code):
+    """Returns the cursor moved to the child node of the letter code"""
+    node = self.node
+    child = node and node.table[code]
+    return CodedCursor(child) if child else DEAD_CURSOR
 
 
 # run the unittest with python3 -m unittest boggle.py
+import io
 import unittest
 
 class TestGrid(unittest.TestCase):
@@ -191,6 +556,48 @@ class TestGrid(unittest.TestCase):
     for word in ['dra', 'caat', 'acd', 'drac', 'tcd']:
       self.assertNotIn(word, words)
 
+  def test_words_coded(self):
+    lexicon = Lexicon()
+    for w in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']:
+      lexicon.add(w)
+    expected = sorted(Grid('aar', 'tcd', lexicon=lexicon).words())
+    coded = CodedLexicon(lexicon)
+    self.assertEqual(sorted(Grid('aar', 'tcd', lexicon=coded).words()),
+                     expected)
+    self.assertEqual(sorted(set(Grid('aar', 'txd', lexicon=coded).words())),
+                     ['ad', 'data', 'rat', 'tad', 'tar'])
+
+  def test_words_unique(self):
+    lexicon = Lexicon()
+    for w in ['card', 'data', 'act', 'arc', 'cad', 'car', 'cat', 'rat',
+                 'rca', 'tad', 'tar', 'ac', 'ad']:
+      lexicon.add(w)
+    for lex in lexicon, CodedLexicon(lexicon):
+      grid = Grid('aart', 'tcdr', 'acta', lexicon=lex)
+      words = grid.words()
+      self.assertGreater(len(words), len(set(words)))
+      self.assertEqual(sorted(grid.words(unique=True)), sorted(set(words)))
+
+  def test_words_unique_skips_exhausted_subtrees(self):
+    lexicon = Lexicon()
+    for w in ['ab', 'abab']:
+      lexicon.add(w)
+    steps = []
+    class CountingCursor(Cursor):
+      __slots__ = ()
+      def step(self, letter):
+        steps.append(letter)
+        return CountingCursor(super().step(letter).node)
+    lexicon.root_cursor = lambda: CountingCursor(lexicon)
+
+    grid = Grid('abab', 'baba', lexicon=lexicon)
+    self.assertEqual(sorted(grid.words(unique=True)), ['ab', 'abab'])
+    unique_steps = len(steps)
+    del steps[:]
+    self.assertEqual(sorted(set(grid.words())), ['ab', 'abab'])
+    self.assertLess(unique_steps, len(steps) / 2)
+
   def test_neighbors(self):
     grid = Grid('aar', 'tcd', lexicon=Lexicon())
     neighbors = list(grid.neighbors((0, 0)))
@@ -202,6 +609,17 @@ class TestGrid(unittest.TestCase):
       self.assertIn(pos, neighbors2)
     self.assertNotIn((1, 1), neighbors2)
 
+  def test_adjacency(self):
+    offsets, neighbors = adjacency(2, 3)
+    self.assertEqual(offsets, (0, 3, 8, 11, 14, 19, 22))
+    self.assertEqual(sorted(neighbors[offsets[4]:offsets[5]]),
+                     [0, 1, 2, 3, 5])
+    grid = Grid('aar', 'tcd', lexicon=Lexicon(), connectivity=4)
+    self.assertEqual(sorted(grid.neighbors((1, 1))), [(0, 1), (1, 0), (1, 2)])
+    self.assertIs(grid.adjacent, adjacency(2, 3, 4)[1])
+    with self.assertRaises(ValueError):
+      adjacency(2, 3, 6)
+
 
 class TestLexicon(unittest.TestCase):
   def test_lexicon(self):
@@ -219,5 +637,146 @@ class TestLexicon(unittest.TestCase):
 
     self.assertFalse(lexicon['NoTfOuNd'])
 
+  def test_cursor(self):
+    lexicon = Lexicon()
+    for word in 'car', 'card', 'cart', 'cat':
+      lexicon.add(word)
+
+    ca = lexicon.root_cursor().step('c').step('a')
+    self.assertTrue(ca.alive)
+    self.assertFalse(ca.is_word)
+    self.assertTrue(ca.step('r').is_word)
+    self.assertTrue(ca.step('t').is_word)
+    self.assertFalse(ca.step('t').step('s').alive)
+    self.assertFalse(ca.step('x').step('t').alive)
+    self.assertEqual(lexicon.info('ca'), (True, False))
+
+  def test_coded_lexicon(self):
+    lexicon = Lexicon()
+    for word in 'car', 'card', 'cart', 'cat':
+      lexicon.add(word)
+    coded = CodedLexicon(lexicon)
+    self.assertEqual(coded.letters, ['', 'a', 'c', 'd', 'r', 't'])
+    self.assertEqual(coded.encode('crab'), [2, 4, 1, 0])
+    for word in 'car', 'card', 'cart', 'cat':
+      self.assertTrue(coded.is_word(word))
+    for word in 'c', 'ca':
+      self.assertFalse(coded.is_word(word))
+      self.assertTrue(coded.is_prefix(word))
+    self.assertFalse(coded.is_prefix('cab'))
+
+    c, a, r, t = coded.encode('cart')
+    ca = coded.root_cursor().step(c).step(a)
+    self.assertTrue(ca.step(r).step(t).is_word)
+    self.assertFalse(ca.step(0).alive)
+    self.assertFalse(ca.step(0).step(t).alive)
+
+  def test_count(self):
+    lexicon = Lexicon()
+    for word in 'car', 'card', 'cart', 'cat', 'car':
+      lexicon.add(word)
+    self.assertEqual(lexicon.count, 4)
+    self.assertEqual(lexicon.get_node('car').count, 3)
+    lexicon.remove('card')
+    self.assertEqual(lexicon.get_node('car').count, 2)
+    f = io.StringIO()
+    lexicon.dump(f)
+    f.seek(0)
+    loaded = Lexicon.load(f)
+    self.assertEqual(loaded.count, 3)
+    self.assertEqual(loaded.get_node('ca').count, 3)
+    self.assertEqual(loaded.get_node('cart').count, 1)
+
+  def test_remove(self):
+    lexicon = Lexicon()
+    for word, weight in [('car', 5), ('card', 3), ('cart', 8), ('dog', 1)]:
+      lexicon.add(word, weight)
+    self.assertTrue(lexicon.remove('cart'))
+    self.assertFalse(lexicon.remove('cart'))
+    self.assertFalse(lexicon.remove('ca'))
+    self.assertFalse(lexicon.remove(''))
+    self.assertFalse(lexicon.is_prefix('cart'))
+    self.assertEqual(lexicon.complete('c'), ['car', 'card'])
+
+    self.assertTrue(lexicon.remove('car'))  # car prefixes card: no pruning.
+    self.assertTrue(lexicon.is_prefix('car'))
+    self.assertFalse(lexicon.is_word('car'))
+    self.assertEqual(lexicon.complete(''), ['card', 'dog'])
+
+    self.assertTrue(lexicon.remove('card'))
+    self.assertEqual(list(lexicon.trie), ['d'])
+
+  def test_compact(self):
+    class ChurnLexicon(Lexicon):
+      compact_every = 2
+
+    lexicon = ChurnLexicon()
+    for word in 'car', 'card', 'cart':
+      lexicon.add(word)
+    lexicon.remove('car')
+    self.assertEqual(lexicon.removed, 1)
+    lexicon.remove('card')
+    self.assertEqual(lexicon.removed, 0)
+    self.assertTrue(lexicon.is_word('cart'))
+    self.assertEqual(lexicon.complete('c'), ['cart'])
+
+  def test_dump_load(self):
+    lexicon = Lexicon()
+    for word, weight in [('car', 5), ('card', 3.5), ('cart', 8), ('dog', -1),
+                         ('a' * 5000, 0)]:
+      lexicon.add(word, weight)
+    f = io.StringIO()
+    lexicon.dump(f)
+    self.assertEqual(f.getvalue().split('\n')[:4], ['3', 'c1', 'a1', 'r2*5'])
+    f.seek(0)
+    loaded = Lexicon.load(f)
+    self.assertEqual(loaded.complete('', 5), lexicon.complete('', 5))
+    self.assertEqual(loaded.complete('car'), ['cart', 'car', 'card'])
+    self.assertTrue(loaded.is_word('a' * 5000))
+    self.assertFalse(loaded.is_prefix('cars'))
+    self.assertEqual(repr(loaded),
+                     "<Lexicon word=False weight=0 children='cda'>")
+
+  def test_fuzzy(self):
+    lexicon = Lexicon()
+    for word in 'car', 'card', 'cart', 'cat', 'act', 'dog':
+      lexicon.add(word)
+    self.assertEqual(lexicon.fuzzy('cat', 0), [('cat', 0)])
+    self.assertEqual(lexicon.fuzzy('cat', 1),
+                     [('cat', 0), ('car', 1), ('cart', 1)])
+    self.assertEqual(lexicon.fuzzy('cta', 2),
+                     [('act', 2), ('car', 2), ('cat', 2)])
+    self.assertEqual(lexicon.fuzzy('xyz', 2), [])
+
+  def test_complete(self):
+    lexicon = Lexicon()
+    for word, weight in [('car', 5), ('card', 3), ('cart', 8), ('cat', 1),
+                         ('dog', 9), ('ca', 2)]:
+      lexicon.add(word, weight)
+
+    self.assertEqual(lexicon.complete('ca', 3), ['cart', 'car', 'card'])
+    self.assertEqual(lexicon.complete('car'), ['cart', 'car', 'card'])
+    self.assertEqual(lexicon.complete('', 1), ['dog'])
+    self.assertEqual(lexicon.complete('x'), [])
+
+    lexicon.add('cat', 7)  # higher weight
+    self.assertEqual(lexicon.complete('ca', 2), ['cart', 'cat'])
+    lexicon.add('cart', 0)  # lower weight
+    self.assertEqual(lexicon.complete('ca', 2), ['cat', 'car'])
+    self.assertEqual(lexicon.complete('ca', 6),
+                     ['cat', 'car', 'card', 'ca', 'cart'])
+
+  def test_complete_beyond_top_size(self):
+    class SmallLexicon(Lexicon):
+      top_size = 2
+
+    lexicon = SmallLexicon()
+    for weight, word in enumerate(['ab', 'abc', 'abd', 'abe', 'ac']):
+      lexicon.add(word, weight)
+    self.assertEqual(lexicon.complete('a', 2), ['ac', 'abe'])
+    self.assertEqual(lexicon.complete('a', 4), ['ac', 'abe', 'abd', 'abc'])
+    lexicon.add('ac', -1)
+    self.assertEqual(lexicon.complete('a', 2), ['abe', 'abd'])
+
 
 